@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================
+# ローカルのスタンドイン（リリースノートページ・OpenAI 互換 API・Slack Webhook）
+# ==========================
+# GET  /pages/<source>       : fixtures/<source>.html を ETag 付きで返す（If-None-Match なら 304）
+# POST /v1/chat/completions  : 入力をそのまま「翻訳済み」として返す（OPENAI_LATENCY 秒待つ。stream なら SSE で少しずつ返す）
+# POST /slack                : 受け取るだけ
+# POST /api/chat.*           : Slack Web API（postMessage / update / delete）。投稿したメッセージを ts ごとに保持する
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# ストリーミング応答で最初の断片を返すまでの時間（OPENAI_LATENCY に対する割合）と、1断片の文字数
+FIRST_TOKEN_RATIO = 0.2
+STREAM_PIECE_CHARS = 40
+
+class FakeServices:
+    def __init__(self, openai_latency=0.0, slack_latency=0.0, pages=None):
+        self.openai_latency = openai_latency
+        self.slack_latency = slack_latency
+        # pages: {source: html}（省略時は fixtures から読む）
+        self.pages = pages or {}
+        self.calls = Counter()
+        self.usage = Counter()
+        self.lock = threading.Lock()
+        self.server = None
+        # Web API で投稿されたメッセージ（ts → 最後に受け取った payload）と、Slack に投稿が届いた時刻
+        self.messages = {}
+        self.post_times = []
+        self.next_ts = 0
+
+    def page(self, source):
+        if source not in self.pages:
+            with open(os.path.join(FIXTURES_DIR, f"{source}.html"), 'r', encoding='utf-8') as f:
+                self.pages[source] = f.read()
+        return self.pages[source]
+
+    def count(self, name, **usage):
+        with self.lock:
+            self.calls[name] += 1
+            self.usage.update(usage)
+            if name == "slack":
+                self.post_times.append(time.perf_counter())
+
+    def start(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body=b"", content_type="application/json", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                source = self.path.rsplit("/", 1)[-1]
+                try:
+                    html = services.page(source)
+                except OSError:
+                    self.reply(404)
+                    return
+                etag = '"' + hashlib.sha256(html.encode("utf-8")).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    services.count("page_304")
+                    self.reply(304, headers={"ETag": etag})
+                    return
+                services.count("page_200")
+                self.reply(200, html.encode("utf-8"), "text/html; charset=utf-8", {"ETag": etag})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.endswith("/chat/completions") and body.get("stream"):
+                    self.stream(services.completion(body))
+                elif self.path.endswith("/chat/completions"):
+                    time.sleep(services.openai_latency)
+                    self.reply(200, json.dumps(services.completion(body), ensure_ascii=False).encode("utf-8"))
+                elif self.path.endswith("/slack"):
+                    time.sleep(services.slack_latency)
+                    services.count("slack")
+                    self.reply(200, b"ok", "text/plain")
+                elif "/api/chat." in self.path:
+                    time.sleep(services.slack_latency)
+                    result = services.slack_api(self.path.rsplit("/", 1)[-1], body, self.headers.get("Authorization"))
+                    self.reply(200, json.dumps(result, ensure_ascii=False).encode("utf-8"))
+                else:
+                    self.reply(404)
+
+            def stream(self, completion):
+                # 応答全体を STREAM_PIECE_CHARS 文字ずつの chunk にして、server-sent events で流す
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                content = completion["choices"][0]["message"]["content"]
+                pieces = [content[i:i + STREAM_PIECE_CHARS] for i in range(0, len(content), STREAM_PIECE_CHARS)] or [""]
+                base = {key: completion[key] for key in ("id", "created", "model")}
+                time.sleep(services.openai_latency * FIRST_TOKEN_RATIO)
+                try:
+                    for piece in pieces:
+                        chunk = {**base, "object": "chat.completion.chunk",
+                                 "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                        self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                        time.sleep(services.openai_latency * (1 - FIRST_TOKEN_RATIO) / len(pieces))
+                    usage = {**base, "object": "chat.completion.chunk", "choices": [], "usage": completion["usage"]}
+                    self.wfile.write(f"data: {json.dumps(usage)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                except (BrokenPipeError, ConnectionResetError):
+                    # クライアントが途中で打ち切った（期限切れなど）
+                    pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def slack_api(self, method, body, authorization):
+        if not (authorization or "").startswith("Bearer "):
+            return {"ok": False, "error": "not_authed"}
+        if method == "chat.postMessage":
+            self.count("slack")
+            with self.lock:
+                ts = f"{int(time.time())}.{self.next_ts:06d}"
+                self.next_ts += 1
+                self.messages[ts] = body
+            return {"ok": True, "channel": body.get("channel"), "ts": ts}
+        if method not in ("chat.update", "chat.delete"):
+            return {"ok": False, "error": "unknown_method"}
+        with self.lock:
+            if body.get("ts") not in self.messages:
+                return {"ok": False, "error": "message_not_found"}
+            if method == "chat.update":
+                self.messages[body["ts"]] = body
+            else:
+                del self.messages[body["ts"]]
+        self.count("slack_update" if method == "chat.update" else "slack_delete")
+        return {"ok": True, "channel": body.get("channel"), "ts": body["ts"]}
+
+    def completion(self, body):
+        user = body["messages"][-1]["content"]
+        if body.get("response_format", {}).get("type") == "json_object":
+            content = json.dumps({title: f"[訳] {text}" for title, text in json.loads(user).items()}, ensure_ascii=False)
+        else:
+            content = f"[訳] {user}"
+        prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 3 + 1
+        completion_tokens = len(content) // 3 + 1
+        self.count("openai", prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        return {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        }
@@ -0,0 +1,228 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CODE_DIR = os.path.join(os.path.dirname(BENCH_DIR), "code")
+sys.path.insert(0, CODE_DIR)
+
+from fake_services import FIXTURES_DIR, FakeServices
+
+# ==========================
+# 設定情報
+# ==========================
+SCENARIOS = ["cold", "no-change", "many-new", "streaming"]
+
+# many-new シナリオでは走査範囲を広げ、fixtures の全セクションを新規として流す
+MANY_NEW_SCAN_LIMIT = 40
+
+# ==========================
+# ステージ計測
+# ==========================
+class StageTimer:
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def add(self, stage, elapsed):
+        with self.lock:
+            self.seconds[stage] += elapsed
+            self.calls[stage] += 1
+
+    def wrap(self, module, name, stage):
+        func = getattr(module, name)
+        if asyncio.iscoroutinefunction(func):
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.add(stage, time.perf_counter() - start)
+        else:
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.add(stage, time.perf_counter() - start)
+        setattr(module, name, wrapper)
+
+def record_windows(module, name):
+    # 呼び出しごとの (開始, 終了) を記録する
+    func = getattr(module, name)
+    windows = []
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            windows.append((start, time.perf_counter()))
+    setattr(module, name, wrapper)
+    return windows
+
+def first_post_seconds(windows, post_times):
+    # deliver の開始から、その中で最初に Slack へ投稿が届くまでの時間（投稿のあったソースの平均）
+    delays = []
+    for start, end in windows:
+        posts = [t for t in post_times if start <= t <= end]
+        if posts:
+            delays.append(min(posts) - start)
+    return round(sum(delays) / len(delays), 4) if delays else None
+
+# ==========================
+# シナリオ実行（1シナリオ = 1プロセス。peak RSS を分けて測るため）
+# ==========================
+def run_scenario(scenario, openai_latency, slack_latency):
+    services = FakeServices(openai_latency=openai_latency, slack_latency=slack_latency).start()
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    os.chdir(workdir)
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["OPENAI_BASE_URL"] = f"{services.base_url}/v1"
+    os.environ["SLACK_WEBHOOK_URL"] = f"{services.base_url}/slack"
+    if scenario == "streaming":
+        # cold と同じ入力を、見出しごとに先に投稿して書き換える方式で送る
+        os.environ.update(
+            SLACK_STREAMING="1", SLACK_BOT_TOKEN="xoxb-bench", SLACK_CHANNEL="C-BENCH", SLACK_API_URL=f"{services.base_url}/api"
+        )
+
+    # 環境変数を設定してから読み込む（各モジュールが import 時に参照するため）
+    import delivery
+    import history_store
+    import page_state
+    import scrape_all
+    import slack_sender
+    import static_fetch
+    import translation
+
+    for source in scrape_all.SOURCES:
+        source.URL = f"{services.base_url}/pages/{source.SOURCE}"
+        if scenario == "many-new":
+            source.SCAN_LIMIT = MANY_NEW_SCAN_LIMIT
+
+    quiet = io.StringIO()
+    if scenario == "no-change":
+        # 1回目で状態を作り、2回目（変更なし）だけを測る
+        with contextlib.redirect_stdout(quiet):
+            scrape_all.main()
+        services.calls.clear()
+        services.usage.clear()
+        services.post_times.clear()
+
+    timer = StageTimer()
+    timer.wrap(page_state, "check_page", "check")
+    timer.wrap(static_fetch, "extract_sections", "extract")
+    timer.wrap(history_store, "classify", "history")
+    timer.wrap(history_store, "record", "history")
+    timer.wrap(translation, "translate_batch_async", "translate")
+    timer.wrap(translation, "translate_stream_async", "translate")
+    timer.wrap(slack_sender, "send_updates", "slack")
+    timer.wrap(delivery, "deliver", "deliver")
+    deliveries = record_windows(delivery, "deliver")
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(quiet):
+        scrape_all.main()
+    wall = time.perf_counter() - start
+    services.stop()
+
+    return {
+        "scenario": scenario,
+        "wall_seconds": round(wall, 4),
+        "first_post_seconds": first_post_seconds(deliveries, services.post_times),
+        "stage_seconds": {stage: round(value, 4) for stage, value in sorted(timer.seconds.items())},
+        "stage_calls": dict(sorted(timer.calls.items())),
+        "service_calls": dict(sorted(services.calls.items())),
+        "tokens": dict(services.usage),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+# ==========================
+# 実ページの記録
+# ==========================
+def record_fixtures():
+    import scrape_all
+    import static_fetch
+
+    for source in scrape_all.SOURCES:
+        try:
+            html = static_fetch.fetch_html(source.URL)
+        except Exception as e:
+            print(f"⚠️ [{source.SOURCE}] 取得エラー: {e}")
+            continue
+        if source.fetch_sections_static(html) is None:
+            print(f"⚠️ [{source.SOURCE}] 静的 HTML に見出しがありません（JS 描画のページです）。記録しません。")
+            continue
+        with open(os.path.join(FIXTURES_DIR, f"{source.SOURCE}.html"), 'w', encoding='utf-8') as f:
+            f.write(html)
+        print(f"💾 [{source.SOURCE}] {len(html)} bytes を記録しました。")
+
+# ==========================
+# レポート
+# ==========================
+def print_report(results):
+    stages = sorted({stage for result in results for stage in result["stage_seconds"]})
+    header = (
+        ["scenario", "wall(s)", "first_post(s)"] + [f"{stage}(s)" for stage in stages]
+        + ["openai", "slack", "slack_upd", "page200", "page304", "peakRSS(MB)"]
+    )
+    rows = []
+    for result in results:
+        calls = result["service_calls"]
+        first_post = result["first_post_seconds"]
+        rows.append(
+            [result["scenario"], f"{result['wall_seconds']:.3f}", "-" if first_post is None else f"{first_post:.3f}"]
+            + [f"{result['stage_seconds'].get(stage, 0.0):.3f}" for stage in stages]
+            + [str(calls.get(name, 0)) for name in ("openai", "slack", "slack_update", "page_200", "page_304")]
+            + [f"{result['peak_rss_kb'] / 1024:.1f}"]
+        )
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    for row in [header] + rows:
+        print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
+    print("※ ステージ時間は全ソースの累積（並行実行分を含む）。first_post は deliver 開始から最初の Slack 投稿までのソース平均")
+
+def main():
+    parser = argparse.ArgumentParser(description="リリースノートクローラーのオフラインベンチマーク")
+    parser.add_argument("--scenario", choices=SCENARIOS + ["all"], default="all")
+    parser.add_argument("--openai-latency", type=float, default=0.5, help="偽 OpenAI の応答遅延（秒）")
+    parser.add_argument("--slack-latency", type=float, default=0.05, help="偽 Slack の応答遅延（秒）")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力する")
+    parser.add_argument("--record", action="store_true", help="実ページを取得して fixtures を更新する")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures()
+        return
+
+    if args.scenario != "all":
+        result = run_scenario(args.scenario, args.openai_latency, args.slack_latency)
+        print(json.dumps(result, ensure_ascii=False) if args.json else result)
+        return
+
+    results = []
+    for scenario in SCENARIOS:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--scenario", scenario, "--json",
+             "--openai-latency", str(args.openai_latency), "--slack-latency", str(args.slack_latency)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_report(results)
+
+if __name__ == "__main__":
+    main()
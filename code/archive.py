@@ -0,0 +1,132 @@
+import argparse
+import json
+import time
+
+import history_store
+import release_note
+
+# ==========================
+# 設定情報
+# ==========================
+# trigram 索引は3文字未満の語を引けないため、短い語は LIKE で絞り込む
+MIN_FTS_TERM = 3
+SNIPPET_CHARS = 60
+
+# ==========================
+# 保存（翻訳 → Slack 送信のたびに原文と翻訳を残す）
+# ==========================
+def store_entries(source, entries, translations, release_dates=None):
+    # entries: [(見出し, 原文), ...] / translations: {見出し: 翻訳結果}（ダイジェスト待ちなどで未翻訳なら空）
+    release_dates = release_dates or {}
+    conn = history_store.connect()
+    try:
+        for title, original in entries:
+            note = release_note.ReleaseNote(
+                release_dates.get(title), source, title, history_store.body_hash(original)
+            )
+            history_store.archive(conn, note, original, translations.get(title, ""))
+    except Exception as e:
+        print(f"⚠️ アーカイブ保存エラー: {e}")
+    finally:
+        conn.close()
+
+# ==========================
+# 検索
+# ==========================
+def fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+def like_pattern(term):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def make_snippet(text, terms):
+    # 最初に一致した語の前後を切り出す（FTS を使わない短い語だけの検索用）
+    flat = " ".join(text.split())
+    positions = [flat.lower().find(term.lower()) for term in terms]
+    positions = [p for p in positions if p >= 0]
+    start = max(0, min(positions) - SNIPPET_CHARS // 2) if positions else 0
+    snippet = flat[start:start + SNIPPET_CHARS * 2]
+    return ("…" if start else "") + snippet + ("…" if start + SNIPPET_CHARS * 2 < len(flat) else "")
+
+def search(conn, query, sources=None, since=None, until=None, limit=20):
+    # 語はすべて含むもの（AND）。3文字以上の語があれば bm25 で並べ、なければ新しい順
+    terms = query.split()
+    long_terms = [term for term in terms if len(term) >= MIN_FTS_TERM]
+    short_terms = [term for term in terms if len(term) < MIN_FTS_TERM]
+
+    where, params = [], []
+    if long_terms:
+        columns = (
+            "a.source, a.title, a.release_date, a.translated, a.original, "
+            "bm25(archive_fts, 4.0, 1.0, 2.0) AS rank, "
+            "snippet(archive_fts, -1, '[', ']', '…', 24) AS snippet"
+        )
+        tables = "archive_fts JOIN archive a ON a.rowid = archive_fts.rowid"
+        where.append("archive_fts MATCH ?")
+        params.append(" ".join(fts_phrase(term) for term in long_terms))
+        order = "rank, a.release_date DESC"
+    else:
+        columns = "a.source, a.title, a.release_date, a.translated, a.original, 0 AS rank, NULL AS snippet"
+        tables = "archive a"
+        order = "a.release_date DESC, a.archived_at DESC"
+
+    for term in short_terms:
+        where.append("(a.title || ' ' || a.original || ' ' || a.translated) LIKE ? ESCAPE '\\'")
+        params.append(like_pattern(term))
+    if sources:
+        where.append(f"a.source IN ({', '.join('?' for _ in sources)})")
+        params.extend(sources)
+    if since:
+        where.append("a.release_date >= ?")
+        params.append(since)
+    if until:
+        where.append("a.release_date <= ?")
+        params.append(until)
+
+    sql = f"SELECT {columns} FROM {tables}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(limit)
+
+    results = []
+    for source, title, release_date, translated, original, rank, snippet in conn.execute(sql, params):
+        results.append({
+            "source": source,
+            "title": title,
+            "release_date": release_date,
+            "score": round(-rank, 3),
+            "snippet": snippet or make_snippet(translated or original, terms),
+        })
+    return results
+
+# ==========================
+# 検索 CLI
+# ==========================
+def main():
+    parser = argparse.ArgumentParser(description="リリースノートのアーカイブを全文検索する")
+    parser.add_argument("query", help="検索語（空白区切りですべてを含むものを探す）")
+    parser.add_argument("--source", action="append", help="ソースで絞り込む（複数指定可）")
+    parser.add_argument("--since", help="リリース日の下限（YYYY-MM-DD）")
+    parser.add_argument("--until", help="リリース日の上限（YYYY-MM-DD）")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力する")
+    args = parser.parse_args()
+
+    conn = history_store.connect()
+    start = time.perf_counter()
+    results = search(conn, args.query, args.source, args.since, args.until, args.limit)
+    elapsed = (time.perf_counter() - start) * 1000
+    conn.close()
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    for result in results:
+        print(f"📄 {result['release_date'] or '----------'} [{result['source']}] {result['title']}")
+        print(f"   {' '.join(result['snippet'].split())}")
+    print(f"🔎 {len(results)} 件（{elapsed:.1f} ms）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import json
+import math
+import os
+import time
+from datetime import date
+
+import circuit
+import deadline
+import delivery
+import history_store
+import language
+import metrics
+import release_note
+import static_fetch
+from browser import init_webdriver
+
+# ==========================
+# 設定情報
+# ==========================
+CHECKPOINT_FILE = "history/backfill_checkpoint.json"
+
+# LLM に送るセクションどうしの最小間隔（秒）。過去分を一気に流して OpenAI の制限に当たらないようにする
+MIN_INTERVAL = float(os.environ.get("BACKFILL_INTERVAL", "2.0"))
+
+# ==========================
+# チェックポイント
+# ==========================
+def load_checkpoint():
+    if os.path.exists(CHECKPOINT_FILE):
+        try:
+            with open(CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+    return {}
+
+def save_checkpoint(checkpoint):
+    # 中断されても壊れたファイルが残らないよう、一時ファイルから置き換える
+    os.makedirs(os.path.dirname(CHECKPOINT_FILE), exist_ok=True)
+    tmp_file = f"{CHECKPOINT_FILE}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_file, CHECKPOINT_FILE)
+
+# ==========================
+# セクションの逐次取得（静的 HTML → Selenium の順に試す）
+# ==========================
+def iter_source_sections(source, offset):
+    try:
+        html = static_fetch.fetch_html(source.URL)
+    except circuit.CircuitOpen:
+        # ブラウザで同じサイトを開き直さず、チェックポイントを残して中断する
+        raise
+    except Exception as e:
+        print(f"⚠️ [{source.SOURCE}] 静的取得エラー: {e}")
+        html = None
+
+    if html is not None and source.fetch_sections_static(html) is not None:
+        yield from source.iter_sections_static(html, offset)
+        return
+
+    print(f"↪️ [{source.SOURCE}] Selenium にフォールバックします。")
+    driver = init_webdriver()
+    try:
+        driver.get(source.URL)
+        yield from source.iter_sections_selenium(driver, offset)
+    finally:
+        driver.quit()
+
+# ==========================
+# バックフィル（翻訳してアーカイブに保存するだけで、Slack には送らない）
+# ==========================
+def backfill_source(source, history, checkpoint):
+    progress = checkpoint.setdefault(source.SOURCE, {"offset": 0, "previous": None, "finished": False})
+    if progress["finished"]:
+        print(f"⏭️ [{source.SOURCE}] バックフィルは完了済みです（やり直す場合は --restart）。")
+        return 0
+
+    # 再開時は続きの見出しから。ページ先頭に新しい更新が増えていても、位置がずれるのは
+    # 処理済みの側なので取りこぼしはなく、処理済みのものはアーカイブの照合で飛ばす
+    offset = progress["offset"]
+    previous = date.fromisoformat(progress["previous"]) if progress["previous"] else None
+    print(f"🗄️ [{source.SOURCE}] バックフィル開始: {offset} 件目から")
+
+    archived = 0
+    last_request = 0.0
+    for title, body in iter_source_sections(source, offset):
+        parsed = source.parse_release_date(title, previous)
+        if parsed is not None:
+            previous = parsed
+        # 通常の配信と同じく「【見出し】本文」を原文として保存し、同じセクションを二重に残さない
+        full_text = f"【{title}】\n{body}"
+        note = release_note.ReleaseNote(parsed, source.SOURCE, title, history_store.body_hash(full_text))
+
+        if not history_store.archived(history, note):
+            # ローカル整形で済むセクションは待たない
+            if not (source.JAPANESE_POLICY == "format" and language.is_japanese(full_text)):
+                wait = MIN_INTERVAL - (time.monotonic() - last_request)
+                if wait > 0:
+                    time.sleep(wait)
+                last_request = time.monotonic()
+            translated = delivery.translate_only(
+                source.SYSTEM_PROMPT, [(title, full_text)], source.SOURCE, source.JAPANESE_POLICY
+            ).get(title)
+            if translated is None:
+                # 翻訳に失敗した・OpenAI への呼び出しを止めている間は、アーカイブせずチェックポイントを残して中断する
+                print(f"⏸️ [{source.SOURCE}] 翻訳できないためバックフィルを中断します（{offset} 件目から再開できます）。")
+                return archived
+            history_store.archive(history, note, full_text, translated)
+            metrics.record("backfill", source.SOURCE, sections=1)
+            archived += 1
+
+        offset += 1
+        progress.update(offset=offset, previous=previous.isoformat() if previous else None)
+        save_checkpoint(checkpoint)
+
+    progress["finished"] = True
+    save_checkpoint(checkpoint)
+    print(f"✅ [{source.SOURCE}] バックフィル完了: {archived} 件をアーカイブしました（計 {offset} 件を確認）。")
+    return archived
+
+def run(sources, restart=False):
+    # チェックポイントから再開できるので、実行全体の期限は設けない（段階ごとのタイムアウトは効く）
+    deadline.start(math.inf)
+    checkpoint = load_checkpoint()
+    for source in sources:
+        if restart:
+            checkpoint.pop(source.SOURCE, None)
+        history = source.load_history()
+        try:
+            backfill_source(source, history, checkpoint)
+        except Exception as e:
+            print(f"❌ [{source.SOURCE}] バックフィルを中断しました（次回はこの位置から再開します）: {e}")
+        finally:
+            history.close()
+    circuit.save_state()
+    metrics.summary()
@@ -0,0 +1,86 @@
+import json
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+import deadline
+import metrics
+
+# ==========================
+# 設定情報
+# ==========================
+# 見出しと本文のテキストだけが必要なので、画像・フォント・動画・計測タグは読み込まない
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3", "*.m3u8",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*segment.com*", "*segment.io*", "*hotjar.com*", "*sentry.io*", "*datadoghq.com*",
+    "*facebook.net*", "*clarity.ms*", "*posthog.com*",
+]
+
+WINDOW_SIZE = "1280,800"
+
+# 全件を逐次取得するとき、1回の execute_script で取り出す見出しの数
+SCRIPT_PAGE_SIZE = 10
+
+# ==========================
+# WebDriver 初期化
+# ==========================
+def init_webdriver():
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-extensions")
+    options.add_argument(f"--window-size={WINDOW_SIZE}")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+    options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    # DOMContentLoaded で制御を返し、待機は各ソースの見出しセレクターに任せる
+    options.page_load_strategy = "eager"
+
+    with metrics.timed("init_webdriver"):
+        driver = webdriver.Chrome(options=options)
+    # driver.get() が応答しないページで実行全体が止まらないようにする
+    driver.set_page_load_timeout(deadline.timeout("page_load"))
+    block_resources(driver)
+    return driver
+
+def block_resources(driver):
+    # CDP のブロック設定はタブ単位なので、新しいタブを開くたびに呼ぶ
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    except Exception as e:
+        print(f"⚠️ リソースブロックの設定に失敗しました: {e}")
+
+# ==========================
+# タブ管理（1つのブラウザで複数ソースを同時に読み込む）
+# ==========================
+def open_tabs(driver, urls):
+    # driver.get() はロード完了までブロックするため、location の書き換えで読み込みだけ開始する
+    handles = {}
+    for i, url in enumerate(urls):
+        if i > 0:
+            driver.switch_to.new_window("tab")
+            block_resources(driver)
+        driver.execute_script("window.location.href = arguments[0];", url)
+        handles[url] = driver.current_window_handle
+    return handles
+
+# ==========================
+# 全件の逐次取得（バックフィル用）
+# ==========================
+def iter_script_sections(driver, script, selector, first=0, page_size=SCRIPT_PAGE_SIZE):
+    # 抽出スクリプトを (first, last) の範囲ごとに呼び、ページ全体を一度に文字列化しない
+    WebDriverWait(driver, deadline.timeout("wait")).until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+    total = driver.execute_script("return document.querySelectorAll(arguments[0]).length;", selector)
+    for start in range(first, total, page_size):
+        raw = driver.execute_script(script, selector, start, min(start + page_size, total))
+        for item in json.loads(raw):
+            yield item["title"], item["body"]
@@ -0,0 +1,76 @@
+import json
+import os
+import threading
+import time
+
+# ==========================
+# 設定情報
+# ==========================
+# 依存先（OpenAI・Slack・ブラウザ・各ページ）ごとの失敗状況。cron の実行をまたいで引き継ぐ
+CIRCUIT_FILE = "history/circuit_state.json"
+
+# 連続でこの回数失敗したら、COOLDOWN 秒のあいだ呼び出しを止める
+FAILURE_THRESHOLD = 3
+COOLDOWN = 30 * 60
+
+_state = None
+_lock = threading.Lock()
+
+class CircuitOpen(Exception):
+    pass
+
+# ==========================
+# 読み書き
+# ==========================
+def load_state():
+    global _state
+    if _state is None:
+        _state = {}
+        if os.path.exists(CIRCUIT_FILE):
+            try:
+                with open(CIRCUIT_FILE, 'r', encoding='utf-8') as f:
+                    _state = json.load(f)
+            except Exception:
+                _state = {}
+    return _state
+
+def save_state():
+    if _state is None:
+        return
+    with _lock:
+        os.makedirs(os.path.dirname(CIRCUIT_FILE), exist_ok=True)
+        tmp_file = f"{CIRCUIT_FILE}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(_state, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_file, CIRCUIT_FILE)
+
+# ==========================
+# 判定・記録
+# ==========================
+def allow(name):
+    # 開いている間は False。COOLDOWN を過ぎたら1回だけ試させ、結果で閉じるか開き直すかを決める
+    with _lock:
+        entry = load_state().get(name)
+        if not entry or entry["failures"] < FAILURE_THRESHOLD:
+            return True
+        if time.time() - entry["opened_at"] < COOLDOWN:
+            return False
+        entry["opened_at"] = time.time()
+        return True
+
+def check(name):
+    if not allow(name):
+        raise CircuitOpen(f"{name} は失敗が続いているため、しばらく呼び出しを止めています")
+
+def success(name):
+    with _lock:
+        load_state().pop(name, None)
+
+def failure(name):
+    with _lock:
+        entry = load_state().setdefault(name, {"failures": 0, "opened_at": 0})
+        entry["failures"] += 1
+        if entry["failures"] == FAILURE_THRESHOLD:
+            print(f"🔌 {name} の失敗が続いているため、{COOLDOWN // 60} 分間呼び出しを止めます。")
+        if entry["failures"] >= FAILURE_THRESHOLD:
+            entry["opened_at"] = time.time()
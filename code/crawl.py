@@ -0,0 +1,125 @@
+import circuit
+import delivery
+import history_store
+import metrics
+import page_state
+import release_note
+import section_diff
+
+# ==========================
+# 差分検出・翻訳・Slack送信
+# ==========================
+# source は各スクレイパーのモジュール（SOURCE / SYSTEM_PROMPT / JAPANESE_POLICY などの設定と、日付の解析・セクション取得を持つ）
+def process_sections(source, history, sections):
+    # 持ち越した更新がなければ True
+    name = source.SOURCE
+    new_entries = []
+    release_dates = {}
+    labels = {}
+    untranslated = set()
+    # 記録済みの最新リリース日より新しい見出しは、履歴を引かずに新規とみなす
+    watermark = history_store.watermark(history, name)
+    notes = release_note.build_notes(name, sections, source.parse_release_date)
+
+    for note, (date_title, content_text) in zip(notes, sections):
+        if watermark is not None and note.date is not None and note.date > watermark:
+            status = "new"
+        else:
+            status = history_store.classify(history, note)
+
+        # 履歴になければ新規投稿、既知の見出しで本文が変わっていれば更新として投稿
+        if status == "new":
+            # 見出しだけ変えた再掲や、他ソースで送った同じ告知は翻訳せず、既出の更新へのリンクだけを送る
+            # 類似していても新しい固有名・数値があれば（定型文が同じ別のリリースなど）通常どおり翻訳する
+            similar = history_store.find_similar(history, content_text)
+            if similar:
+                dup_source, dup_title, score = similar
+                print(f"♻️ [{name}] 既出の内容と同じため翻訳を省略します: {date_title}（[{dup_source}] {dup_title}、類似度 {score:.2f}）")
+                metrics.record("near_duplicate", name, similarity=round(score, 2))
+                content_text = f"♻️ [{dup_source}] {dup_title} と同じ内容です（翻訳は省略しました）"
+                untranslated.add(date_title)
+            else:
+                print(f"✨ [{name}] 新規アップデート発見: {date_title}")
+        elif status == "edited":
+            print(f"✏️ [{name}] 既存アップデートの更新を発見: {date_title}")
+            # 前回の本文と項目単位で比べ、追加・削除された項目だけを送る
+            delta = section_diff.delta_text(history_store.load_items(history, name, date_title), content_text, name)
+            if delta == "":
+                print("   ↪️ 項目の追加・削除はないため送信しません。")
+                continue
+            if delta is not None:
+                content_text = delta
+        else:
+            continue
+
+        # 本文を取り出せなかったときの表示（None ならそのまま送る）
+        if not content_text.strip() and source.EMPTY_BODY_TEXT:
+            content_text = source.EMPTY_BODY_TEXT
+
+        label = date_title if status == "new" else f"{date_title}（更新）"
+        full_text = f"【{label}】\n{content_text}"
+        new_entries.append((label, full_text))
+        release_dates[label] = note.date
+        labels[date_title] = label
+
+    # 新規分をまとめて翻訳し、1件の Slack メッセージに集約して送信（送信済みのものは再送しない）
+    delivered = delivery.deliver(
+        source.SYSTEM_PROMPT, new_entries, name, source.SLACK_WEBHOOK_URL, source.SLACK_HEADER, source.SLACK_FOOTER,
+        japanese_policy=source.JAPANESE_POLICY, urgent=source.URGENT, release_dates=release_dates, untranslated=untranslated,
+    )
+    if new_entries:
+        print(f"✅ [{name}] {len(delivered)} 件の更新を送信しました。")
+    else:
+        print(f"📭 [{name}] 新しい更新はありません。")
+
+    # 履歴を更新（今回チェックした見出し・本文ハッシュ・リリース日・項目の指紋を記録）
+    # 翻訳・送信できずに持ち越した見出しは記録せず、次回の実行でもう一度検出させる
+    deferred = {title for title, label in labels.items() if label not in delivered}
+    for note, (date_title, content_text) in zip(notes, sections):
+        if date_title not in deferred:
+            history_store.record(history, note, content_text)
+    history_store.set_deferred(history, name, [note for note in notes if note.title in deferred])
+    return not deferred
+
+# ==========================
+# 1ソース分のクロール（python code/scrape_<ソース>.py で単独に動かすとき）
+# ==========================
+def main(source):
+    history = source.load_history()
+
+    try:
+        print(f"🔍 [{source.SOURCE}] 調査開始: {source.URL}")
+        # ページ自体に変更がなければ描画も抽出もしない
+        state = page_state.load_state()
+        page = page_state.check_page(source.URL, state, source.SOURCE)
+        if page["unchanged"]:
+            print("📭 ページに変更がないためスキップします。")
+            return
+        if page["skipped"]:
+            return
+
+        watermark = history_store.scan_watermark(history, source.SOURCE)
+        sections = source.fetch_sections_static(page["html"], watermark)
+        if sections is None:
+            print("↪️ 静的 HTML に見出しがないため Selenium にフォールバックします。")
+            page["rendered"] = True
+            sections = source.fetch_sections_selenium(watermark=watermark)
+
+        if page_state.sections_unchanged(source.URL, state, sections):
+            print("📭 抽出結果に変更がないためスキップします。")
+            complete = True
+        else:
+            complete = process_sections(source, history, sections)
+
+        # 持ち越した更新があれば、ページの状態を記録せず次回もう一度処理する
+        if complete:
+            page_state.remember(source.URL, state, page, sections)
+            page_state.save_state(state)
+
+    except circuit.CircuitOpen as e:
+        print(f"⏸️ {e}。次回に持ち越します。")
+    except Exception as e:
+        print(f"❌ エラーが発生しました: {e}")
+    finally:
+        circuit.save_state()
+        metrics.summary()
@@ -0,0 +1,259 @@
+import json
+import os
+import signal
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from selenium.common.exceptions import WebDriverException
+
+import circuit
+import crawl
+import deadline
+import digest
+import history_store
+import metrics
+import page_state
+from browser import init_webdriver
+
+# ==========================
+# 設定情報
+# ==========================
+# ヘルスチェック・メトリクスの待ち受け（ローカルからのみ）
+DAEMON_HOST = os.environ.get("DAEMON_HOST", "127.0.0.1")
+DAEMON_PORT = int(os.environ.get("DAEMON_PORT", "9464"))
+
+# ポーリング間隔（秒）。変更を見つけたら最短に戻し、変更がなければ BACKOFF 倍ずつ延ばす
+MIN_INTERVAL = 10 * 60
+MAX_INTERVAL = 6 * 60 * 60
+INITIAL_INTERVAL = 60 * 60
+BACKOFF = 1.5
+
+# 曜日ごとの更新頻度で間隔を伸縮する幅と、それを使い始める履歴の件数
+ACTIVITY_RANGE = (0.5, 2.0)
+ACTIVITY_MIN_SAMPLES = 7
+
+# 長時間動かした Chrome はメモリが膨らむので、一定回数使ったら起動し直す
+DRIVER_MAX_USES = 50
+
+# 連続でこの回数失敗したソースがあれば /healthz を 503 にする
+UNHEALTHY_ERRORS = 3
+
+# ==========================
+# ポーリング間隔の調整
+# ==========================
+def activity_weight(counts, today=None):
+    # 今日の曜日の更新件数が平均より多ければ 1 より大きく、少なければ 1 より小さくなる
+    total = sum(counts)
+    if total < ACTIVITY_MIN_SAMPLES:
+        return 1.0
+    weekday = (today or date.today()).weekday()
+    low, high = ACTIVITY_RANGE
+    return min(high, max(low, counts[weekday] * 7 / total))
+
+def next_interval(current, changed):
+    if changed:
+        return MIN_INTERVAL
+    return min(MAX_INTERVAL, current * BACKOFF)
+
+def scheduled_delay(interval, weight):
+    return min(MAX_INTERVAL, max(MIN_INTERVAL, interval / weight))
+
+# ==========================
+# 常駐クローラー
+# ==========================
+class Daemon:
+    def __init__(self, sources):
+        self.sources = sources
+        self.stopping = threading.Event()
+        self.started_at = time.time()
+        self.driver = None
+        self.driver_uses = 0
+        self.stages = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "max_seconds": 0.0})
+        self.totals = defaultdict(int)
+        self.lock = threading.Lock()
+        # 起動直後は全ソースを一巡させる
+        self.status = {
+            source.SOURCE: {
+                "interval": INITIAL_INTERVAL, "next_run": self.started_at, "last_run": None,
+                "last_change": None, "last_error": None, "errors": 0, "polls": 0,
+            }
+            for source in sources
+        }
+
+    # ---------- WebDriver（必要になったときだけ起動し、使い回す） ----------
+    def get_driver(self):
+        if self.driver is not None and self.driver_uses >= DRIVER_MAX_USES:
+            self.reset_driver()
+        if self.driver is None:
+            self.driver = init_webdriver()
+            self.driver_uses = 0
+        self.driver_uses += 1
+        return self.driver
+
+    def reset_driver(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+        self.driver = None
+
+    # ---------- 1ソース分のクロール ----------
+    def crawl(self, source, history, state):
+        page = page_state.check_page(source.URL, state, source.SOURCE)
+        if page["unchanged"] or page["skipped"]:
+            return False
+
+        watermark = history_store.scan_watermark(history, source.SOURCE)
+        try:
+            sections = source.fetch_sections_static(page["html"], watermark)
+        except circuit.CircuitOpen as e:
+            print(f"⏸️ [{source.SOURCE}] {e}。次回に持ち越します。")
+            return False
+        if sections is None:
+            page["rendered"] = True
+            driver = self.get_driver()
+            with metrics.timed("page_load", source.SOURCE):
+                driver.get(source.URL)
+            sections = source.fetch_sections_selenium(driver, watermark)
+
+        changed = not page_state.sections_unchanged(source.URL, state, sections)
+        complete = crawl.process_sections(source, history, sections) if changed else True
+        # 持ち越した更新があれば、ページの状態を記録せず次のポーリングでもう一度処理する
+        if complete:
+            page_state.remember(source.URL, state, page, sections)
+            page_state.save_state(state)
+        return changed
+
+    def poll(self, source, history, state):
+        status = self.status[source.SOURCE]
+        print(f"🔍 [{source.SOURCE}] ポーリング（間隔 {status['interval'] / 60:.0f} 分）")
+        changed = False
+        # 1回のポーリングごとに期限を設け、応答しない依存先で常駐プロセスが止まらないようにする
+        deadline.start()
+        try:
+            changed = self.crawl(source, history, state)
+            status.update(last_error=None, errors=0)
+        except Exception as e:
+            print(f"❌ [{source.SOURCE}] エラーが発生しました: {e}")
+            status.update(last_error=str(e), errors=status["errors"] + 1)
+            if isinstance(e, WebDriverException):
+                self.reset_driver()
+        finally:
+            if digest.ENABLED:
+                try:
+                    digest.flush()
+                except Exception as e:
+                    print(f"❌ ダイジェスト送信エラー: {e}")
+            circuit.save_state()
+            self.collect_metrics()
+
+        now = time.time()
+        weight = activity_weight(history_store.weekday_activity(history, source.SOURCE))
+        with self.lock:
+            status["interval"] = next_interval(status["interval"], changed)
+            status["next_run"] = now + scheduled_delay(status["interval"], weight)
+            status["last_run"] = now
+            status["polls"] += 1
+            if changed:
+                status["last_change"] = now
+        metrics.record("daemon_poll", source.SOURCE, changed=changed, interval=status["interval"], weight=round(weight, 2))
+
+    def collect_metrics(self):
+        # 溜まったイベントを起動時からの累計に足し込み、手元には残さない
+        stages, totals = metrics.drain()
+        with self.lock:
+            for key, stats in stages.items():
+                merged = self.stages[key]
+                merged["calls"] += stats["calls"]
+                merged["seconds"] += stats["seconds"]
+                merged["max_seconds"] = max(merged["max_seconds"], stats["max_seconds"])
+            for key, value in totals.items():
+                self.totals[key] += value
+
+    # ---------- スケジューラー ----------
+    def run(self):
+        server = self.start_server()
+        signal.signal(signal.SIGTERM, lambda *_: self.stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: self.stopping.set())
+
+        histories = {source: source.load_history() for source in self.sources}
+        state = page_state.load_state()
+        print(f"🟢 常駐モードで起動しました（http://{DAEMON_HOST}:{DAEMON_PORT}/healthz）")
+        try:
+            while not self.stopping.is_set():
+                source = min(self.sources, key=lambda s: self.status[s.SOURCE]["next_run"])
+                delay = self.status[source.SOURCE]["next_run"] - time.time()
+                if delay > 0:
+                    self.stopping.wait(delay)
+                    continue
+                self.poll(source, histories[source], state)
+        finally:
+            print("🛑 常駐モードを終了します。")
+            server.shutdown()
+            self.reset_driver()
+            for history in histories.values():
+                history.close()
+
+    # ---------- ヘルスチェック・メトリクス ----------
+    def health(self):
+        with self.lock:
+            sources = {name: dict(status) for name, status in self.status.items()}
+        healthy = all(status["errors"] < UNHEALTHY_ERRORS for status in sources.values())
+        return healthy, {
+            "status": "ok" if healthy else "degraded",
+            "uptime_seconds": round(time.time() - self.started_at),
+            "browser": self.driver is not None,
+            "sources": sources,
+        }
+
+    def metrics_text(self):
+        with self.lock:
+            text = metrics.prometheus_text(self.stages, self.totals)
+            lines = [
+                "# HELP release_notes_poll_interval_seconds Current polling interval per source.",
+                "# TYPE release_notes_poll_interval_seconds gauge",
+            ]
+            for name, status in sorted(self.status.items()):
+                lines.append(f'release_notes_poll_interval_seconds{{source="{name}"}} {status["interval"]:.0f}')
+            lines += [
+                "# HELP release_notes_consecutive_errors Consecutive failed polls per source.",
+                "# TYPE release_notes_consecutive_errors gauge",
+            ]
+            for name, status in sorted(self.status.items()):
+                lines.append(f'release_notes_consecutive_errors{{source="{name}"}} {status["errors"]}')
+        return text + "\n".join(lines) + "\n"
+
+    def start_server(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/healthz":
+                    healthy, body = daemon.health()
+                    self.reply(200 if healthy else 503, "application/json", json.dumps(body, ensure_ascii=False))
+                elif self.path == "/metrics":
+                    self.reply(200, "text/plain; version=0.0.4", daemon.metrics_text())
+                else:
+                    self.reply(404, "text/plain", "not found\n")
+
+            def reply(self, status, content_type, body):
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((DAEMON_HOST, DAEMON_PORT), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+def run(sources):
+    Daemon(sources).run()
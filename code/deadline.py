@@ -0,0 +1,49 @@
+import math
+import os
+import time
+
+# ==========================
+# 設定情報
+# ==========================
+# 1回の実行にかけてよい時間（秒）。ページ取得・抽出・翻訳・送信のすべてがこの残り時間の中で動く
+RUN_BUDGET = float(os.environ.get("RUN_DEADLINE_SECONDS", str(20 * 60)))
+
+# 段階ごとの上限（秒）。残り時間がこれより短ければ残り時間のほうを使う
+STAGE_TIMEOUTS = {
+    "page_fetch": 15.0,
+    "page_load": 30.0,
+    "wait": 20.0,
+    "translate": 90.0,
+    "slack": 10.0,
+}
+
+# 残り時間がわずかでも、タイムアウト 0 で呼び出して即失敗させないための下限
+MIN_TIMEOUT = 1.0
+
+_deadline = time.monotonic() + RUN_BUDGET
+
+class DeadlineExceeded(Exception):
+    pass
+
+# ==========================
+# 期限の管理
+# ==========================
+def start(budget=None):
+    # 実行（常駐モードでは1回のポーリング）の開始時に呼ぶ。math.inf で期限なし
+    global _deadline
+    _deadline = time.monotonic() + (RUN_BUDGET if budget is None else budget)
+
+def remaining():
+    if _deadline == math.inf:
+        return math.inf
+    return max(0.0, _deadline - time.monotonic())
+
+def expired():
+    return remaining() <= 0
+
+def timeout(stage):
+    # 段階の上限と残り時間の短いほう。期限を過ぎていれば DeadlineExceeded
+    left = remaining()
+    if left <= 0:
+        raise DeadlineExceeded(f"実行時間の上限に達したため {stage} を中止しました")
+    return max(MIN_TIMEOUT, min(STAGE_TIMEOUTS[stage], left))
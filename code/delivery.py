@@ -0,0 +1,328 @@
+import asyncio
+import collections
+import math
+import os
+import time
+
+import httpx
+from openai import AsyncOpenAI
+
+import archive
+import deadline
+import digest
+import language
+import metrics
+import slack_sender
+import translation
+import translation_cache
+
+# ==========================
+# 設定情報
+# ==========================
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+
+# 同時に走らせる翻訳リクエスト数の上限
+CONCURRENCY = int(os.environ.get("PIPELINE_CONCURRENCY", "4"))
+
+# SLACK_STREAMING=1 のとき、見出しごとに先に投稿し、翻訳が届くにつれてメッセージを書き換える（Bot トークンが必要）
+STREAMING = (
+    os.environ.get("SLACK_STREAMING") == "1" and bool(slack_sender.SLACK_BOT_TOKEN) and bool(slack_sender.SLACK_CHANNEL)
+)
+
+# ストリーミング中の chat.update は、実行中の全ソース・全見出しを合わせて直近60秒で STREAM_UPDATES_PER_MINUTE 回まで
+# （chat.update のレート制限は1分あたり約50回）。途中経過の書き換えは STREAM_UPDATE_INTERVAL 秒に1回までとし、
+# 枠の半分は最後の全文の書き込みのために残しておく
+STREAM_UPDATES_PER_MINUTE = 40
+STREAM_UPDATE_INTERVAL = 1.5
+_update_times = collections.deque()
+
+# OpenAI SDK 側の再試行回数（ジッターつきの指数バックオフ）。1回あたりの上限は deadline.STAGE_TIMEOUTS
+OPENAI_RETRIES = 2
+
+# ==========================
+# 翻訳 → Slack 送信パイプライン
+# ==========================
+async def run_pipeline(system_prompt, entries, source, webhook_url, header, footer, japanese_policy="translate", release_dates=None, untranslated=None):
+    # entries: [(見出し, 本文), ...] → 送信済みになった見出しの集合
+    # untranslated の見出しは翻訳せず、本文をそのまま送る（既出の告知へのリンクなど）
+    # 送信済み台帳にある更新は翻訳も送信もしない（再実行時の二重投稿防止）
+    ledger = slack_sender.load_ledger()
+    keys = {title: slack_sender.delivery_key(source, title, text) for title, text in entries}
+    pending = [(title, text) for title, text in entries if keys[title] not in ledger]
+    if len(pending) < len(entries):
+        print(f"⏭️ 送信済みの {len(entries) - len(pending)} 件をスキップします。")
+    if not pending:
+        return {title for title, _ in entries}
+
+    untranslated = untranslated or set()
+    results = await translate_entries(
+        system_prompt, [(title, text) for title, text in pending if title not in untranslated], source, japanese_policy
+    )
+    results.update({title: text for title, text in pending if title in untranslated})
+    # 期限切れ・OpenAI の停止で翻訳できなかったものは送らず、履歴にも残さずに次回へ回す
+    ready = [(title, text) for title, text in pending if results.get(title) is not None]
+    if len(ready) < len(pending):
+        print(f"⏸️ {len(pending) - len(ready)} 件は翻訳できなかったため次回に持ち越します。")
+    # Slack に送ったあとでも探せるよう、原文と翻訳を全文検索つきのアーカイブに残す
+    archive.store_entries(source, ready, results, release_dates)
+
+    items = [(keys[title], results[title]) for title, _ in ready]
+    if items:
+        async with httpx.AsyncClient(limits=httpx.Limits(max_connections=1)) as http:
+            await slack_sender.send_updates(http, webhook_url, header, items, footer, ledger, source)
+        slack_sender.save_ledger(ledger)
+    return {title for title, _ in entries if keys[title] in ledger}
+
+async def translate_entries(system_prompt, entries, source, japanese_policy="translate"):
+    # entries: [(見出し, 本文), ...] → {見出し: 翻訳結果}（翻訳できなかった見出しは None）
+    # 既に日本語のセクションは方針に応じてローカル整形・小さいモデル・通常の翻訳に振り分ける
+    routes = language.route(entries, japanese_policy)
+    for policy, routed in routes.items():
+        if routed:
+            metrics.record("language_route", source, route=policy, sections=len(routed))
+
+    # 長すぎるセクションは分割して並行に翻訳し、元の順に組み立て直す
+    summary_items, summary_chunked = translation.plan_chunks(routes["summarize"])
+    translate_items, translate_chunked = translation.plan_chunks(routes["translate"])
+    chunked = {**summary_chunked, **translate_chunked}
+    for title, (chunks, truncated) in chunked.items():
+        metrics.record("chunk", source, chunks=len(chunks), truncated=truncated)
+        if truncated:
+            print(f"✂️ 本文が長すぎるため途中で打ち切ります: {title}")
+
+    results = {title: language.format_japanese(text) for title, text in routes["format"]}
+    summary_cached, summary_batches = translation.plan_batches(system_prompt, summary_items, source, model=translation.SUMMARY_MODEL)
+    translate_cached, translate_batches = translation.plan_batches(system_prompt, translate_items, source)
+    results.update(summary_cached)
+    results.update(translate_cached)
+    jobs = [(batch, translation.SUMMARY_MODEL) for batch in summary_batches] + [(batch, translation.MODEL) for batch in translate_batches]
+    chunk_jobs = [
+        (title, index, chunk, model)
+        for model, routed in ((translation.SUMMARY_MODEL, summary_chunked), (translation.MODEL, translate_chunked))
+        for title, (chunks, _) in routed.items()
+        for index, chunk in enumerate(chunks)
+    ]
+    if (jobs or chunk_jobs) and deadline.expired():
+        print("⏱️ 実行時間の上限に達したため、翻訳を次回に持ち越します。")
+    elif jobs or chunk_jobs:
+        parts = await translate_jobs(system_prompt, jobs, chunk_jobs, source, results)
+        for title, (chunks, truncated) in chunked.items():
+            translated = [parts.get((title, index)) for index in range(len(chunks))]
+            if None not in translated:
+                results[title] = translation.join_chunks(translated, truncated)
+    return results
+
+async def translate_jobs(system_prompt, jobs, chunk_jobs, source, results):
+    # 翻訳は並行に走らせ、全件そろったら1ソース1メッセージにまとめて送る
+    # 分割したセクションの翻訳は {(見出し, 分割番号): 翻訳結果} で返す
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    aclient = AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=deadline.timeout("translate"), max_retries=OPENAI_RETRIES)
+
+    async def translate(batch, model):
+        async with semaphore:
+            return await translation.translate_batch_async(aclient, system_prompt, batch, source, model)
+
+    async def translate_chunk(title, index, chunk, model):
+        async with semaphore:
+            return (title, index), await translation.translate_chunk_async(aclient, system_prompt, chunk, index, source, model)
+
+    batch_tasks = [asyncio.ensure_future(translate(batch, model)) for batch, model in jobs]
+    chunk_tasks = [asyncio.ensure_future(translate_chunk(*job)) for job in chunk_jobs]
+    left = deadline.remaining()
+    try:
+        # 実行全体の期限までに終わらなかった翻訳は打ち切る（終わった分の結果は使う）
+        done, unfinished = await asyncio.wait(batch_tasks + chunk_tasks, timeout=None if left == math.inf else left)
+        if unfinished:
+            print(f"⏱️ 実行時間の上限のため、翻訳リクエスト {len(unfinished)} 件を打ち切りました。")
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+    finally:
+        await aclient.close()
+        translation_cache.save_cache()
+
+    finished = [task for task in done if not task.cancelled() and task.exception() is None]
+    for task in batch_tasks:
+        if task in finished:
+            results.update(task.result())
+    return dict(task.result() for task in chunk_tasks if task in finished)
+
+# ==========================
+# ストリーミング表示のパイプライン（見出しごとに投稿 → 翻訳に合わせて更新）
+# ==========================
+async def stream_pipeline(system_prompt, entries, source, header, footer, japanese_policy="translate", release_dates=None, untranslated=None):
+    # 戻り値は run_pipeline と同じく送信済みになった見出しの集合
+    # 一括翻訳はせず、見出しごとに応答をストリーミングで受け取る
+    started = time.perf_counter()
+    ledger = slack_sender.load_ledger()
+    keys = {title: slack_sender.delivery_key(source, title, text) for title, text in entries}
+    pending = [(title, text) for title, text in entries if keys[title] not in ledger]
+    if len(pending) < len(entries):
+        print(f"⏭️ 送信済みの {len(entries) - len(pending)} 件をスキップします。")
+    if not pending:
+        return {title for title, _ in entries}
+    if deadline.expired():
+        print("⏱️ 実行時間の上限に達したため、翻訳を次回に持ち越します。")
+        return {title for title, _ in entries if keys[title] in ledger}
+
+    routes = language.route(pending, japanese_policy)
+    policies = {}
+    for policy, routed in routes.items():
+        if routed:
+            metrics.record("language_route", source, route=policy, sections=len(routed))
+        for title, _ in routed:
+            policies[title] = policy
+
+    results = {}
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    # Slack と OpenAI で接続プールを共有する（クライアントを2つ作ると最初の投稿がその分遅れる）
+    http = httpx.AsyncClient(limits=httpx.Limits(max_connections=CONCURRENCY * 2 + 1))
+    aclient = AsyncOpenAI(
+        api_key=OPENAI_API_KEY, timeout=deadline.timeout("translate"), max_retries=OPENAI_RETRIES, http_client=http
+    )
+
+    async def translate(title, text, on_delta):
+        # 長すぎるセクションは分割した順に流し込む
+        if title in (untranslated or set()):
+            on_delta(text)
+            return text
+        if policies[title] == "format":
+            formatted = language.format_japanese(text)
+            on_delta(formatted)
+            return formatted
+        model = translation.SUMMARY_MODEL if policies[title] == "summarize" else translation.MODEL
+        _, chunked = translation.plan_chunks([(title, text)])
+        chunks, truncated = chunked.get(title, ([text], False))
+        if title in chunked:
+            metrics.record("chunk", source, chunks=len(chunks), truncated=truncated)
+        if truncated:
+            print(f"✂️ 本文が長すぎるため途中で打ち切ります: {title}")
+        parts = []
+        for index, chunk in enumerate(chunks):
+            if index:
+                on_delta("\n")
+            part = await translation.translate_stream_async(
+                aclient, translation.chunk_prompt(system_prompt, index), chunk, on_delta, source, model
+            )
+            if part is None:
+                return None
+            parts.append(part)
+        return translation.join_chunks(parts, truncated) if title in chunked else parts[0]
+
+    # chat.update は直近60秒の回数の枠から1回分ずつ取って呼ぶ。最後の全文の書き込みを途中経過より優先する
+    live = {}
+    pace = {"finals": 0}
+
+    async def paced_update(ts, text, final=False):
+        await take_update_slot()
+        # 途中経過は取りこぼしても次の更新で追いつくので、再送せず失敗も数えない
+        return await slack_sender.update_message(http, ts, header, text, footer, source, final=final, best_effort=not final)
+
+    async def refresh():
+        # 途中経過は1つのループで、しばらく更新していない見出しから順に反映する
+        while True:
+            await asyncio.sleep(STREAM_UPDATE_INTERVAL)
+            dirty = [entry for entry in live.values() if entry["dirty"]]
+            if pace["finals"] or not dirty or update_budget() <= STREAM_UPDATES_PER_MINUTE // 2:
+                continue
+            entry = min(dirty, key=lambda e: e["updated"])
+            entry["dirty"] = False
+            entry["updated"] = time.monotonic()
+            await paced_update(entry["ts"], f"{entry['text']}\n{slack_sender.PLACEHOLDER}")
+
+    async def stream_entry(title, text, ts):
+        entry = live[title] = {"ts": ts, "text": "", "dirty": False, "updated": 0.0}
+
+        def on_delta(piece):
+            entry["text"] += piece
+            entry["dirty"] = True
+
+        try:
+            async with semaphore:
+                results[title] = await translate(title, text, on_delta)
+        finally:
+            live.pop(title, None)
+        if results[title] is None:
+            return
+        pace["finals"] += 1
+        try:
+            if await paced_update(ts, results[title], final=True):
+                ledger[keys[title]] = int(time.time())
+        finally:
+            pace["finals"] -= 1
+
+    refresher = asyncio.ensure_future(refresh())
+    try:
+        # 抽出が終わった時点で見出しだけのメッセージをページの順に出し、出したものから翻訳を始める
+        messages = {}
+        tasks = []
+        for title, text in pending:
+            ts = await slack_sender.post_placeholder(http, header, title, footer, source)
+            if ts is None:
+                continue
+            if not messages:
+                metrics.record("first_notification", source, time.perf_counter() - started)
+            messages[title] = ts
+            tasks.append(asyncio.ensure_future(stream_entry(title, text, ts)))
+
+        left = deadline.remaining()
+        if tasks:
+            _, unfinished = await asyncio.wait(tasks, timeout=None if left == math.inf else left)
+            if unfinished:
+                print(f"⏱️ 実行時間の上限のため、翻訳 {len(unfinished)} 件を打ち切りました。")
+                for task in unfinished:
+                    task.cancel()
+                await asyncio.gather(*unfinished, return_exceptions=True)
+
+        refresher.cancel()
+        await asyncio.gather(refresher, return_exceptions=True)
+
+        # 送りきれなかった見出しは、途中までのメッセージを消して次回に持ち越す
+        deferred = [title for title, _ in pending if keys[title] not in ledger]
+        if deferred:
+            print(f"⏸️ {len(deferred)} 件は翻訳・送信できなかったため次回に持ち越します。")
+            for title in deferred:
+                if title in messages:
+                    await slack_sender.delete_message(http, messages[title], source)
+    finally:
+        refresher.cancel()
+        await http.aclose()
+        translation_cache.save_cache()
+        slack_sender.save_ledger(ledger)
+
+    ready = [(title, text) for title, text in pending if keys[title] in ledger]
+    archive.store_entries(source, ready, results, release_dates)
+    return {title for title, _ in entries if keys[title] in ledger}
+
+def update_budget():
+    # 直近60秒で残っている chat.update の回数
+    now = time.monotonic()
+    while _update_times and now - _update_times[0] >= 60:
+        _update_times.popleft()
+    return STREAM_UPDATES_PER_MINUTE - len(_update_times)
+
+async def take_update_slot():
+    # 確認から記録までの間に await を挟まないので、並行するタスクが同じ枠を取り合うことはない
+    while update_budget() <= 0:
+        await asyncio.sleep(60 - (time.monotonic() - _update_times[0]))
+    _update_times.append(time.monotonic())
+
+def deliver(system_prompt, entries, source, webhook_url, header, footer, japanese_policy="translate", urgent=False, release_dates=None, untranslated=None):
+    # release_dates: {見出し: リリース日}（アーカイブの日付検索用）
+    # untranslated: 翻訳せずにそのまま送る見出しの集合
+    # 戻り値は送信済み（またはダイジェストに追加済み）になった見出しの集合
+    if not entries:
+        return set()
+    # ダイジェストモードでは、緊急扱いのソース以外はキューに溜めるだけにする（アーカイブには原文だけ先に残す）
+    if digest.ENABLED and not urgent:
+        archive.store_entries(source, entries, {}, release_dates)
+        return digest.enqueue(source, entries, footer)
+    if STREAMING:
+        return asyncio.run(stream_pipeline(system_prompt, entries, source, header, footer, japanese_policy, release_dates, untranslated))
+    return asyncio.run(run_pipeline(system_prompt, entries, source, webhook_url, header, footer, japanese_policy, release_dates, untranslated))
+
+def translate_only(system_prompt, entries, source, japanese_policy="translate"):
+    # Slack には送らず、翻訳結果だけを返す（バックフィル用）
+    if not entries:
+        return {}
+    return asyncio.run(translate_entries(system_prompt, entries, source, japanese_policy))
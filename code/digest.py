@@ -0,0 +1,148 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+
+import httpx
+from openai import OpenAI
+
+import circuit
+import deadline
+import history_store
+import metrics
+import slack_sender
+import translation
+
+# ==========================
+# 設定情報
+# ==========================
+# DIGEST_MODE=1 のとき、緊急扱いでないソースの更新はすぐに送らずダイジェストにまとめる
+ENABLED = os.environ.get("DIGEST_MODE") == "1"
+WINDOW_HOURS = float(os.environ.get("DIGEST_WINDOW_HOURS", "24"))
+SLACK_WEBHOOK_URL = os.environ.get("SLACK_WEBHOOK_URL")
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+
+SOURCE = "digest"
+SLACK_HEADER = "📰 *AI リリースノート ダイジェスト*"
+
+# 1回の要約に入れる更新の上限（超えた分は省略を明記する）
+MAX_DIGEST_TOKENS = 24000
+
+DIGEST_PROMPT = (
+    "あなたは優秀なエンジニア兼翻訳者です。入力は複数の AI サービスのリリースノート更新で、「## ソース名」ごとに並んでいます。"
+    "日本のユーザー向けに、ソースごとの小見出し（*太字*）と箇条書きで、日本語の1つのダイジェストにまとめてください。"
+    "重要度の高い変更（新モデル・料金・提供終了・破壊的変更）は先頭に置いてください。"
+)
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS digest_queue (
+    delivery_key TEXT PRIMARY KEY,
+    source       TEXT NOT NULL,
+    title        TEXT NOT NULL,
+    text         TEXT NOT NULL,
+    footer       TEXT NOT NULL,
+    queued_at    INTEGER NOT NULL
+);
+"""
+
+# ==========================
+# キュー（全ソース共通の SQLite に溜める）
+# ==========================
+def connect():
+    conn = history_store.connect()
+    conn.executescript(QUEUE_SCHEMA)
+    return conn
+
+def enqueue(source, entries, footer):
+    # 送信済み台帳にあるもの・既にキューにあるものは追加しない
+    # 戻り値は送信済み・キュー追加済みの見出しの集合
+    ledger = slack_sender.load_ledger()
+    rows = []
+    for title, text in entries:
+        key = slack_sender.delivery_key(source, title, text)
+        if key not in ledger:
+            rows.append((key, source, title, text, footer, int(time.time())))
+
+    conn = connect()
+    try:
+        before = conn.total_changes
+        conn.executemany("INSERT OR IGNORE INTO digest_queue VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+        queued = conn.total_changes - before
+    finally:
+        conn.close()
+    print(f"🗂️ {queued} 件をダイジェストに追加しました（{WINDOW_HOURS:g} 時間ごとにまとめて送信）。")
+    metrics.record("digest_enqueue", source, sections=queued)
+    return {title for title, _ in entries}
+
+# ==========================
+# まとめて要約・送信
+# ==========================
+def build_input(rows):
+    # ソースごとにまとめ、1回の LLM 呼び出しに収まる長さで打ち切る
+    blocks = []
+    current = None
+    for _, source, title, text, _, _ in rows:
+        if source != current:
+            blocks.append(f"## {source}")
+            current = source
+        blocks.append(text)
+    text, truncated = translation.cap_text("\n\n".join(blocks), MAX_DIGEST_TOKENS)
+    return text, truncated
+
+def flush(force=False):
+    # 最も古い更新がウィンドウを過ぎたら、1回の要約と1件の Slack 投稿で送る
+    conn = connect()
+    try:
+        rows = conn.execute(
+            "SELECT delivery_key, source, title, text, footer, queued_at FROM digest_queue ORDER BY source, queued_at"
+        ).fetchall()
+        if not rows:
+            return 0
+        oldest = min(row[5] for row in rows)
+        if not force and time.time() - oldest < WINDOW_HOURS * 3600:
+            return 0
+
+        # OpenAI の失敗が続いている・期限切れのときは、キューを残して次回の実行でやり直す
+        if not circuit.allow("openai") or deadline.expired():
+            print("⏸️ ダイジェストの送信を次回に持ち越します。")
+            return 0
+        text, truncated = build_input(rows)
+        client = OpenAI(api_key=OPENAI_API_KEY, timeout=deadline.timeout("translate"), max_retries=2)
+        try:
+            summary = translation.request_one(client, DIGEST_PROMPT, text, SOURCE)
+            circuit.success("openai")
+        except Exception as e:
+            print(f"⚠️ ダイジェスト要約エラー: {e}")
+            circuit.failure("openai")
+            return 0
+        if truncated:
+            summary = f"{summary}\n{translation.TRUNCATION_NOTICE}"
+
+        period = f"{datetime.fromtimestamp(oldest):%m/%d %H:%M} 〜 {datetime.now():%m/%d %H:%M}"
+        header = f"{SLACK_HEADER}（{period}・{len(rows)} 件）"
+        footer = "\n".join(dict.fromkeys(row[4] for row in rows))
+        sent = asyncio.run(post(header, summary, footer, [row[0] for row in rows]))
+        if not sent:
+            return 0
+
+        conn.executemany("DELETE FROM digest_queue WHERE delivery_key = ?", [(row[0],) for row in rows])
+        conn.commit()
+        print(f"✅ ダイジェストを送信しました（{len(rows)} 件）。")
+        metrics.record("digest_flush", SOURCE, sections=len(rows))
+        return len(rows)
+    finally:
+        conn.close()
+
+async def post(header, summary, footer, keys):
+    # 送信できたら、まとめた各更新を送信済み台帳に記録する
+    ledger = slack_sender.load_ledger()
+    digest_key = slack_sender.delivery_key(SOURCE, header, summary)
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=1)) as http:
+        sent = await slack_sender.send_updates(http, SLACK_WEBHOOK_URL, header, [(digest_key, summary)], footer, ledger, SOURCE)
+    if sent:
+        now = int(time.time())
+        for key in keys:
+            ledger[key] = now
+    slack_sender.save_ledger(ledger)
+    return sent
@@ -0,0 +1,289 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from datetime import date
+
+import near_dup
+import section_diff
+
+# ==========================
+# 設定情報
+# ==========================
+DB_FILE = "history/release_notes.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    source     TEXT NOT NULL,
+    title      TEXT NOT NULL,
+    body_hash  TEXT NOT NULL,
+    first_seen INTEGER NOT NULL,
+    last_seen  INTEGER NOT NULL,
+    release_date TEXT,
+    PRIMARY KEY (source, title, body_hash)
+);
+CREATE INDEX IF NOT EXISTS entries_by_title ON entries (source, title);
+
+CREATE TABLE IF NOT EXISTS section_items (
+    source    TEXT NOT NULL,
+    title     TEXT NOT NULL,
+    position  INTEGER NOT NULL,
+    item_hash TEXT NOT NULL,
+    text      TEXT NOT NULL,
+    PRIMARY KEY (source, title, position)
+);
+
+CREATE TABLE IF NOT EXISTS archive (
+    source       TEXT NOT NULL,
+    title        TEXT NOT NULL,
+    body_hash    TEXT NOT NULL,
+    release_date TEXT,
+    original     TEXT NOT NULL,
+    translated   TEXT NOT NULL,
+    archived_at  INTEGER NOT NULL,
+    PRIMARY KEY (source, title, body_hash)
+);
+
+CREATE TABLE IF NOT EXISTS signatures (
+    id        INTEGER PRIMARY KEY,
+    source    TEXT NOT NULL,
+    title     TEXT NOT NULL,
+    body_hash TEXT NOT NULL,
+    minhash   BLOB NOT NULL,
+    UNIQUE (source, title, body_hash)
+);
+
+-- 翻訳・送信できずに次回へ持ち越した見出し（次回の走査をこのリリース日より前で打ち切らないため）
+CREATE TABLE IF NOT EXISTS deferred (
+    source       TEXT NOT NULL,
+    title        TEXT NOT NULL,
+    release_date TEXT,
+    PRIMARY KEY (source, title)
+);
+
+-- LSH の帯ごとの索引。(帯, 値) で引くので、件数が増えても候補探しは索引の検索だけで済む
+CREATE TABLE IF NOT EXISTS signature_bands (
+    band      INTEGER NOT NULL,
+    bucket    INTEGER NOT NULL,
+    signature INTEGER NOT NULL,
+    PRIMARY KEY (band, bucket, signature)
+) WITHOUT ROWID;
+"""
+
+# アーカイブの全文検索。日本語は単語区切りがないため trigram（3文字単位）で索引を作る
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE archive_fts USING fts5(
+    title, original, translated, content='archive', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER archive_fts_insert AFTER INSERT ON archive BEGIN
+    INSERT INTO archive_fts (rowid, title, original, translated) VALUES (new.rowid, new.title, new.original, new.translated);
+END;
+CREATE TRIGGER archive_fts_delete AFTER DELETE ON archive BEGIN
+    INSERT INTO archive_fts (archive_fts, rowid, title, original, translated) VALUES ('delete', old.rowid, old.title, old.original, old.translated);
+END;
+CREATE TRIGGER archive_fts_update AFTER UPDATE ON archive BEGIN
+    INSERT INTO archive_fts (archive_fts, rowid, title, original, translated) VALUES ('delete', old.rowid, old.title, old.original, old.translated);
+    INSERT INTO archive_fts (rowid, title, original, translated) VALUES (new.rowid, new.title, new.original, new.translated);
+END;
+INSERT INTO archive_fts (archive_fts) VALUES ('rebuild');
+"""
+
+# release_date 列を追加する前に作られた DB 向け
+MIGRATIONS = [
+    ("release_date", "ALTER TABLE entries ADD COLUMN release_date TEXT"),
+]
+INDEXES = "CREATE INDEX IF NOT EXISTS entries_by_date ON entries (source, release_date);"
+
+# 旧 JSON 履歴から取り込んだ見出しは本文が分からないため、空のハッシュで記録する
+UNKNOWN_HASH = ""
+
+# ==========================
+# 接続・初期化
+# ==========================
+def connect(db_file=None):
+    db_file = db_file or DB_FILE
+    os.makedirs(os.path.dirname(db_file), exist_ok=True)
+    conn = sqlite3.connect(db_file)
+    conn.executescript(SCHEMA)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+    for column, statement in MIGRATIONS:
+        if column not in columns:
+            conn.execute(statement)
+    conn.executescript(INDEXES)
+    # 索引より前に保存されたアーカイブも検索できるよう、作成時に一度だけ作り直す
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'archive_fts'").fetchone():
+        conn.executescript(FTS_SCHEMA)
+    return conn
+
+def import_legacy(conn, source, history_file):
+    # このソースの行がまだ無いときだけ、旧形式（見出しの JSON リスト）を取り込む
+    if conn.execute("SELECT 1 FROM entries WHERE source = ? LIMIT 1", (source,)).fetchone():
+        return
+    if not os.path.exists(history_file):
+        return
+    try:
+        with open(history_file, 'r', encoding='utf-8') as f:
+            titles = json.load(f)
+    except Exception:
+        return
+
+    now = int(time.time())
+    conn.executemany(
+        "INSERT OR IGNORE INTO entries (source, title, body_hash, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)",
+        [(source, title, UNKNOWN_HASH, now, now) for title in titles if title],
+    )
+    conn.commit()
+
+# ==========================
+# 判定・記録
+# ==========================
+def body_hash(body):
+    # 静的 HTML と Selenium で空白の出方が違っても同じ本文として扱う
+    normalized = " ".join((body or "").split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def classify(conn, note):
+    # "new": 未知の見出し / "edited": 既知の見出しで本文が変わった / "seen": 既知
+    hashes = {row[0] for row in conn.execute(
+        "SELECT body_hash FROM entries WHERE source = ? AND title = ?", (note.source, note.title)
+    )}
+    if not hashes:
+        return "new"
+    if note.body_hash in hashes or hashes == {UNKNOWN_HASH}:
+        return "seen"
+    return "edited"
+
+def watermark(conn, source):
+    # このソースで記録済みの最新リリース日（日付を解析できた行がなければ None）
+    row = conn.execute("SELECT MAX(release_date) FROM entries WHERE source = ?", (source,)).fetchone()
+    return date.fromisoformat(row[0]) if row and row[0] else None
+
+def scan_watermark(conn, source):
+    # 走査を打ち切る基準日。持ち越した見出しがあれば、その見出しより古い見出しに達するまでは読む
+    # （後の見出しを記録して watermark が上がっても、持ち越した見出しが走査から外れないように）
+    mark = watermark(conn, source)
+    dates = [row[0] for row in conn.execute("SELECT release_date FROM deferred WHERE source = ?", (source,))]
+    if mark is None or not dates:
+        return mark
+    if None in dates:
+        return None
+    return min(mark, min(date.fromisoformat(value) for value in dates))
+
+def set_deferred(conn, source, notes):
+    # 今回持ち越した見出しで置き換える（送れたものやページから消えたものは残さない）
+    conn.execute("DELETE FROM deferred WHERE source = ?", (source,))
+    conn.executemany(
+        "INSERT OR IGNORE INTO deferred VALUES (?, ?, ?)",
+        [(source, note.title, note.date.isoformat() if note.date else None) for note in notes],
+    )
+    conn.commit()
+
+def weekday_activity(conn, source):
+    # リリース日の曜日ごとの件数（月曜 = 0 ... 日曜 = 6）
+    counts = [0] * 7
+    for (release_date,) in conn.execute(
+        "SELECT DISTINCT release_date FROM entries WHERE source = ? AND release_date IS NOT NULL", (source,)
+    ):
+        counts[date.fromisoformat(release_date).weekday()] += 1
+    return counts
+
+def load_items(conn, source, title):
+    # 前回記録したときの本文の項目（[(指紋, 本文), ...]、ページ上の順）
+    return conn.execute(
+        "SELECT item_hash, text FROM section_items WHERE source = ? AND title = ? ORDER BY position",
+        (source, title),
+    ).fetchall()
+
+def record(conn, note, body=None):
+    now = int(time.time())
+    release_date = note.date.isoformat() if note.date else None
+    # 本文が分かったので、旧履歴から取り込んだ仮の行は置き換える
+    conn.execute(
+        "DELETE FROM entries WHERE source = ? AND title = ? AND body_hash = ?",
+        (note.source, note.title, UNKNOWN_HASH),
+    )
+    conn.execute(
+        "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (source, title, body_hash) DO UPDATE SET "
+        "last_seen = excluded.last_seen, release_date = COALESCE(excluded.release_date, release_date)",
+        (note.source, note.title, note.body_hash, now, now, release_date),
+    )
+    # 次回の差分のため、最新の本文の項目で置き換える
+    if body is not None:
+        conn.execute("DELETE FROM section_items WHERE source = ? AND title = ?", (note.source, note.title))
+        conn.executemany(
+            "INSERT INTO section_items VALUES (?, ?, ?, ?, ?)",
+            [(note.source, note.title, position, digest, text)
+             for position, (digest, text) in enumerate(section_diff.split_items(body))],
+        )
+        index_signature(conn, note, body)
+    conn.commit()
+
+# ==========================
+# 類似本文の索引（見出しだけ変わった再掲・他ソースの同じ告知を見つける）
+# ==========================
+def index_signature(conn, note, body):
+    # 同じ本文は一度だけ署名を計算する
+    if conn.execute(
+        "SELECT 1 FROM signatures WHERE source = ? AND title = ? AND body_hash = ?",
+        (note.source, note.title, note.body_hash),
+    ).fetchone():
+        return
+    sig = near_dup.signature(body)
+    if sig is None:
+        return
+    cursor = conn.execute(
+        "INSERT INTO signatures (source, title, body_hash, minhash) VALUES (?, ?, ?, ?)",
+        (note.source, note.title, note.body_hash, near_dup.pack(sig)),
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO signature_bands VALUES (?, ?, ?)",
+        [(band, bucket, cursor.lastrowid) for band, bucket in near_dup.band_keys(sig)],
+    )
+
+def find_similar(conn, body):
+    # 言い直し・再掲とみなせる記録済みの本文のうち最も近いもの → (ソース, 見出し, 類似度)。なければ None
+    # 類似度は署名からの推定ではなく、記録済みの本文との実際の Jaccard 類似度
+    sig = near_dup.signature(body)
+    if sig is None:
+        return None
+    keys = near_dup.band_keys(sig)
+    candidates = conn.execute(
+        "SELECT s.source, s.title, s.minhash FROM signatures s WHERE s.id IN ("
+        "SELECT signature FROM signature_bands WHERE "
+        + " OR ".join("(band = ? AND bucket = ?)" for _ in keys) + ")",
+        [value for key in keys for value in key],
+    ).fetchall()
+    best = None
+    for source, title, minhash in candidates:
+        if near_dup.similarity(sig, near_dup.unpack(minhash)) < near_dup.THRESHOLD:
+            continue
+        items = load_items(conn, source, title)
+        if not items:
+            continue
+        score, restated = near_dup.compare(body, "\n".join(text for _, text in items))
+        if restated and (best is None or score > best[2]):
+            best = (source, title, score)
+    return best
+
+# ==========================
+# アーカイブ（原文と翻訳の保存）
+# ==========================
+def archived(conn, note):
+    return conn.execute(
+        "SELECT 1 FROM archive WHERE source = ? AND title = ? AND body_hash = ?",
+        (note.source, note.title, note.body_hash),
+    ).fetchone() is not None
+
+def archive(conn, note, original, translated):
+    # INSERT OR REPLACE では削除トリガーが動かず全文検索の索引とずれるため、UPSERT で更新する
+    conn.execute(
+        "INSERT INTO archive VALUES (?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (source, title, body_hash) DO UPDATE SET "
+        "release_date = excluded.release_date, original = excluded.original, "
+        "translated = excluded.translated, archived_at = excluded.archived_at",
+        (note.source, note.title, note.body_hash, note.date.isoformat() if note.date else None,
+         original, translated, int(time.time())),
+    )
+    conn.commit()
@@ -0,0 +1,58 @@
+import re
+
+# ==========================
+# 設定情報
+# ==========================
+# 日本語と判定する「日本語文字 /（日本語文字 + ラテン文字）」の下限
+JAPANESE_RATIO_THRESHOLD = 0.3
+
+# 既に日本語のセクションの扱い
+#   "format"    : LLM を使わずローカルで整形する
+#   "summarize" : 小さいモデルで要約する
+#   "translate" : 外国語と同じく通常のモデルに送る
+POLICIES = ("format", "summarize", "translate")
+
+# ローカル整形時の本文の上限（Slack の1ブロックに収まる長さ）
+FORMAT_MAX_CHARS = 2500
+
+KANA_PATTERN = re.compile("[\u3040-\u309f\u30a0-\u30ff\uff66-\uff9f]")
+KANJI_PATTERN = re.compile("[\u4e00-\u9fff]")
+LATIN_PATTERN = re.compile(r"[A-Za-z]")
+
+# ==========================
+# 言語判定
+# ==========================
+def is_japanese(text):
+    kana = len(KANA_PATTERN.findall(text))
+    kanji = len(KANJI_PATTERN.findall(text))
+    latin = len(LATIN_PATTERN.findall(text))
+    # 漢字だけでは中国語と区別できないため、仮名を含むことを条件にする
+    if kana == 0:
+        return False
+    return (kana + kanji) / (kana + kanji + latin) >= JAPANESE_RATIO_THRESHOLD
+
+def route(entries, japanese_policy):
+    # entries: [(見出し, 本文), ...] → {"format": [...], "summarize": [...], "translate": [...]}
+    if japanese_policy not in POLICIES:
+        raise ValueError(f"unknown japanese_policy: {japanese_policy}")
+    routes = {policy: [] for policy in POLICIES}
+    for title, text in entries:
+        policy = japanese_policy if is_japanese(text) else "translate"
+        routes[policy].append((title, text))
+    return routes
+
+# ==========================
+# ローカル整形
+# ==========================
+def format_japanese(text):
+    # 1行目（【日付】）はそのまま、以降の行は箇条書きにする
+    lines = [" ".join(line.split()) for line in text.split("\n")]
+    lines = [line for line in lines if line]
+    if not lines:
+        return text
+
+    head, body = lines[0], lines[1:]
+    formatted = "\n".join([f"*{head}*"] + [line if line.startswith(("•", "・", "-")) else f"• {line}" for line in body])
+    if len(formatted) > FORMAT_MAX_CHARS:
+        formatted = formatted[:FORMAT_MAX_CHARS].rstrip() + "\n…（以下省略。全文は出典を参照してください）"
+    return formatted
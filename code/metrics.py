@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+# ==========================
+# 設定情報
+# ==========================
+# 1イベント1行の JSON Lines。Prometheus の textfile は METRICS_PROM_FILE を指定したときだけ書き出す
+METRICS_FILE = os.environ.get("METRICS_FILE", "logs/metrics.jsonl")
+METRICS_PROM_FILE = os.environ.get("METRICS_PROM_FILE")
+
+RUN_ID = uuid.uuid4().hex[:12]
+
+# ソースごとに合計する量。ページの取得量（fetched）、抽出した本文の量（extracted）、スナップショットの保存量（stored）は別々に数える
+UNIT_FIELDS = ("prompt_tokens", "completion_tokens", "fetched_bytes", "extracted_bytes", "stored_bytes")
+
+_events = []
+_lock = threading.Lock()
+
+# ==========================
+# 記録
+# ==========================
+def record(stage, source=None, seconds=None, **fields):
+    event = {"ts": round(time.time(), 3), "run_id": RUN_ID, "stage": stage, "source": source}
+    if seconds is not None:
+        event["seconds"] = round(seconds, 4)
+    event.update(fields)
+
+    with _lock:
+        _events.append(event)
+        try:
+            os.makedirs(os.path.dirname(METRICS_FILE) or ".", exist_ok=True)
+            with open(METRICS_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"⚠️ メトリクス書き込みエラー: {e}")
+    return event
+
+@contextmanager
+def timed(stage, source=None, **fields):
+    # ブロック内で fields に値（トークン数・バイト数など）を追加できる
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        record(stage, source, time.perf_counter() - start, **fields)
+
+def usage_fields(response):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
+
+# ==========================
+# 実行単位の集計
+# ==========================
+def aggregate(events=None):
+    stages = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "max_seconds": 0.0})
+    totals = defaultdict(int)
+    if events is None:
+        with _lock:
+            events = list(_events)
+    for event in events:
+        key = (event["stage"], event.get("source") or "")
+        stats = stages[key]
+        stats["calls"] += 1
+        seconds = event.get("seconds", 0.0)
+        stats["seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        for field in UNIT_FIELDS:
+            totals[(field, event.get("source") or "")] += event.get(field, 0) or 0
+    return stages, totals
+
+def drain():
+    # 常駐モード用: 溜まったイベントを集計して手放す（プロセスが長く動いてもメモリが増え続けないように）
+    with _lock:
+        events = list(_events)
+        _events.clear()
+    return aggregate(events)
+
+def summary():
+    stages, totals = aggregate()
+    if not stages:
+        return
+
+    print(f"📊 実行サマリー (run_id={RUN_ID})")
+    for (stage, source), stats in sorted(stages.items()):
+        label = f"{stage}[{source}]" if source else stage
+        print(f"   {label}: {stats['calls']} 回 / 計 {stats['seconds']:.2f} 秒 / 最大 {stats['max_seconds']:.2f} 秒")
+    prompt = sum(value for (field, _), value in totals.items() if field == "prompt_tokens")
+    completion = sum(value for (field, _), value in totals.items() if field == "completion_tokens")
+    fetched = sum(value for (field, _), value in totals.items() if field == "fetched_bytes")
+    extracted = sum(value for (field, _), value in totals.items() if field == "extracted_bytes")
+    print(f"   tokens: prompt {prompt} / completion {completion}, 取得 {fetched} bytes / 抽出 {extracted} bytes")
+
+    record("run_summary", prompt_tokens=prompt, completion_tokens=completion, fetched_bytes=fetched, extracted_bytes=extracted)
+    if METRICS_PROM_FILE:
+        write_prometheus(stages, totals)
+
+def prometheus_text(stages, totals):
+    lines = [
+        "# HELP release_notes_stage_seconds Time spent per stage in the last run (since start in daemon mode).",
+        "# TYPE release_notes_stage_seconds gauge",
+    ]
+    for (stage, source), stats in sorted(stages.items()):
+        lines.append(f'release_notes_stage_seconds{{stage="{stage}",source="{source}"}} {stats["seconds"]:.4f}')
+    lines += [
+        "# HELP release_notes_stage_calls Calls per stage in the last run (since start in daemon mode).",
+        "# TYPE release_notes_stage_calls gauge",
+    ]
+    for (stage, source), stats in sorted(stages.items()):
+        lines.append(f'release_notes_stage_calls{{stage="{stage}",source="{source}"}} {stats["calls"]}')
+    lines += [
+        "# HELP release_notes_units Tokens, fetched/extracted bytes and stored snapshot bytes in the last run (since start in daemon mode).",
+        "# TYPE release_notes_units gauge",
+    ]
+    for (field, source), value in sorted(totals.items()):
+        lines.append(f'release_notes_units{{kind="{field}",source="{source}"}} {value}')
+    lines += [
+        "# TYPE release_notes_last_run_timestamp_seconds gauge",
+        f"release_notes_last_run_timestamp_seconds {time.time():.0f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(stages, totals):
+    # node_exporter が書き込み途中のファイルを読まないよう、一時ファイルから置き換える
+    os.makedirs(os.path.dirname(METRICS_PROM_FILE) or ".", exist_ok=True)
+    tmp_file = f"{METRICS_PROM_FILE}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text(stages, totals))
+    os.replace(tmp_file, METRICS_PROM_FILE)
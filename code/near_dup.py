@@ -0,0 +1,90 @@
+import hashlib
+import random
+import re
+import struct
+
+# ==========================
+# 設定情報
+# ==========================
+# 文字 5-gram の集合を MinHash で要約し、推定 Jaccard 類似度がしきい値以上のものを重複の候補にする
+# 候補は記録済みの本文と実際の 5-gram 集合で比べ直し、類似度がしきい値以上で、新しい 5-gram が MAX_NEW_RATIO 以下、
+# かつ新しい固有名・数値（KEY_TERM_PATTERN）がないときに重複とみなす。「today」→「this week」のような言い直しは重複、
+# 定型文が同じ別のリリース（「GPT-5 を Plus に」と「GPT-5 mini を Free に」など）は新しい固有名があるので重複にしない
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+THRESHOLD = 0.85
+MAX_NEW_RATIO = 0.1
+
+# 固有名・バージョン・数値・パラメータ名など、別のリリースを見分ける語（大文字・数字・_ を含む英数字の語）
+KEY_TERM_PATTERN = re.compile(r"[A-Za-z0-9][\w.\-]*")
+
+# LSH: 署名を BANDS 個の帯（1帯 ROWS 個）に分け、どれかの帯が一致したものだけを候補にする
+# 類似度 0.85 なら 99% 以上、0.5 なら 6% 程度が候補に上がる（しきい値の目安は (1/BANDS)^(1/ROWS) ≒ 0.71）
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# 短い本文は1語の違い（パラメータ名など）で別の告知になりやすく、翻訳も安いので判定しない
+MIN_CHARS = 200
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+# 実行をまたいで同じ署名になるよう、置換の係数は固定の乱数列から作る
+_rng = random.Random(20240601)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+# ==========================
+# 署名
+# ==========================
+def normalize(body):
+    return " ".join((body or "").lower().split())
+
+def shingles(text):
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+def shingle_hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+
+def signature(body):
+    # 本文の MinHash 署名（NUM_PERM 個の整数）。短すぎる本文は None
+    text = normalize(body)
+    if len(text) < MIN_CHARS:
+        return None
+    hashes = [shingle_hash(shingle) for shingle in shingles(text)]
+    return [min([(a * h + b) % MERSENNE_PRIME for h in hashes]) & MAX_HASH for a, b in PERMUTATIONS]
+
+def key_terms(body):
+    return {
+        term.rstrip(".-") for term in KEY_TERM_PATTERN.findall(body or "")
+        if any(c.isupper() or c.isdigit() or c == "_" for c in term)
+    }
+
+def compare(body, other):
+    # (実際の Jaccard 類似度, 言い直し・再掲とみなせるか)
+    left, right = shingles(normalize(body)), shingles(normalize(other))
+    if not left or not right:
+        return 0.0, False
+    score = len(left & right) / len(left | right)
+    # 文頭の大文字など、記録済みの本文に小文字で出てくる語は新しい固有名に数えない
+    known = {word.lower() for word in KEY_TERM_PATTERN.findall(other)}
+    new_terms = {term for term in key_terms(body) if term.lower() not in known}
+    restated = score >= THRESHOLD and len(left - right) <= MAX_NEW_RATIO * len(left) and not new_terms
+    return score, restated
+
+def similarity(left, right):
+    # 一致する要素の割合が Jaccard 類似度の推定値になる
+    return sum(1 for x, y in zip(left, right) if x == y) / NUM_PERM
+
+def band_keys(sig):
+    # [(帯の番号, 帯の値のハッシュ), ...]。SQLite の INTEGER に収まるよう符号付き 64bit にする
+    keys = []
+    for band in range(BANDS):
+        rows = struct.pack(f"<{ROWS}I", *sig[band * ROWS:(band + 1) * ROWS])
+        keys.append((band, int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), "little", signed=True)))
+    return keys
+
+def pack(sig):
+    return struct.pack(f"<{NUM_PERM}I", *sig)
+
+def unpack(blob):
+    return list(struct.unpack(f"<{NUM_PERM}I", blob))
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import re
+
+import circuit
+import metrics
+import static_fetch
+
+# ==========================
+# 設定情報
+# ==========================
+STATE_FILE = "history/page_state.json"
+
+# リクエストごとに変わる属性（CSP の nonce など）はフィンガープリントから除外する
+VOLATILE_ATTR_PATTERN = re.compile(r'\s(?:nonce|data-csrf[\w-]*)="[^"]*"')
+
+# ==========================
+# 状態の読み書き
+# ==========================
+def load_state():
+    if os.path.exists(STATE_FILE):
+        try:
+            with open(STATE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+    return {}
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    with open(STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+# ==========================
+# フィンガープリント
+# ==========================
+def content_hash(html):
+    normalized = VOLATILE_ATTR_PATTERN.sub("", html)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def sections_hash(sections):
+    payload = json.dumps(sections, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# ==========================
+# 条件付き取得
+# ==========================
+def check_page(url, state, source=None):
+    # ETag / Last-Modified を付けた GET を1回だけ送り、変更の有無を判定する
+    previous = state.get(url, {})
+    headers = {}
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+
+    # skipped: ページの取得を止めている（失敗が続いている）ため、今回はこのソースを処理しない
+    # rendered: 静的 HTML に見出しがなく Selenium で描画した（呼び出し側が設定する）
+    page = {
+        "unchanged": False,
+        "skipped": False,
+        "rendered": False,
+        "html": None,
+        "etag": previous.get("etag"),
+        "last_modified": previous.get("last_modified"),
+        "content_hash": previous.get("content_hash"),
+    }
+    try:
+        with metrics.timed("conditional_fetch", source) as m:
+            response = static_fetch.fetch_response(url, headers)
+            m["status"] = response.status_code
+            m["fetched_bytes"] = len(response.content)
+    except circuit.CircuitOpen as e:
+        print(f"⏸️ {e}。次回に持ち越します。")
+        page["skipped"] = True
+        return page
+    except Exception as e:
+        print(f"⚠️ 条件付き取得エラー: {e}")
+        return page
+
+    if response.status_code == 304:
+        page["unchanged"] = True
+        return page
+
+    page["html"] = response.text
+    page["etag"] = response.headers.get("ETag")
+    page["last_modified"] = response.headers.get("Last-Modified")
+    page["content_hash"] = content_hash(response.text)
+    page["unchanged"] = page["content_hash"] == previous.get("content_hash")
+    return page
+
+def sections_unchanged(url, state, sections):
+    return sections_hash(sections) == state.get(url, {}).get("sections_hash")
+
+def remember(url, state, page, sections):
+    # 処理が最後まで成功したときだけ呼ぶ（失敗時は次回も再処理させる）
+    # Selenium で描画したページは、静的 HTML（JS を読み込むだけの外枠）が同じでも中身が変わりうるため、
+    # ETag・本文ハッシュを残さず、次回も描画して抽出結果（sections_hash）だけで比べる
+    static = not page.get("rendered")
+    state[url] = {
+        "etag": page["etag"] if static else None,
+        "last_modified": page["last_modified"] if static else None,
+        "content_hash": page["content_hash"] if static else None,
+        "sections_hash": sections_hash(sections),
+    }
@@ -0,0 +1,122 @@
+import re
+from datetime import date, timedelta
+
+import history_store
+
+# ==========================
+# 設定情報
+# ==========================
+# 月名は完全な綴りか決まった略記だけを受け付ける（"Marketing 5" や "Decoder 3" を日付にしない）
+MONTHS = {
+    "january": 1, "february": 2, "march": 3, "april": 4, "may": 5, "june": 6,
+    "july": 7, "august": 8, "september": 9, "october": 10, "november": 11, "december": 12,
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "sept": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+
+# "2026年8月19日" / "2026 年 7 月 21 日"
+JA_DATE_PATTERN = re.compile(r"(\d{4})\s*年\s*(\d{1,2})\s*月\s*(\d{1,2})\s*日")
+# "August 21, 2026" / "Aug 21 2026" / "May 1"
+EN_DATE_PATTERN = re.compile(r"\b([A-Za-z]{3,9})\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b(?:,?\s*(\d{4}))?")
+
+# 年のない日付は「今日」より先にならない年とみなす（時差やページの先行公開のぶんだけ余裕を持たせる）
+FUTURE_GRACE_DAYS = 7
+
+# 走査は watermark よりこの日数だけ古い見出しまで続ける（既存の項目への追記・修正を見つけるため）
+LOOKBACK_DAYS = 30
+
+# ==========================
+# リリースノートの1件
+# ==========================
+class ReleaseNote:
+    __slots__ = ("date", "source", "title", "body_hash")
+
+    def __init__(self, date, source, title, body_hash):
+        self.date = date
+        self.source = source
+        self.title = title
+        self.body_hash = body_hash
+
+    def __repr__(self):
+        return f"ReleaseNote({self.date}, {self.source!r}, {self.title!r}, {self.body_hash[:8]})"
+
+# ==========================
+# 日付の解析
+# ==========================
+def make_date(year, month, day):
+    try:
+        return date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+def parse_ja_date(title, previous=None):
+    match = JA_DATE_PATTERN.search(title)
+    return make_date(*match.groups()) if match else None
+
+def parse_en_date(title, previous=None):
+    # "Grok 4 May 1" のように月名以外の語が先に一致することがあるので、月名が見つかるまで探す
+    for match in EN_DATE_PATTERN.finditer(title):
+        name = match.group(1).lower()
+        month = MONTHS.get(name)
+        if month is None:
+            continue
+        if match.group(3):
+            return make_date(match.group(3), month, match.group(2))
+        return infer_year(month, int(match.group(2)), previous)
+    return None
+
+def infer_year(month, day, previous=None, today=None):
+    # ページは新しい順に並ぶので、直前（1つ上）の見出しより後にならない年を選ぶ。
+    # 先頭の見出しは今日を基準にする（年をまたいだ直後の "Dec 31" などを前年として扱うため）
+    # 2月29日は直近のうるう年までさかのぼる（2100年のように4年おきにならない世紀をまたいでも8年あれば足りる）
+    limit = previous or (today or date.today()) + timedelta(days=FUTURE_GRACE_DAYS)
+    for year in range(limit.year, limit.year - 9, -1):
+        parsed = make_date(year, month, day)
+        if parsed is not None and parsed <= limit:
+            return parsed
+    return None
+
+# ==========================
+# 見出し列の処理
+# ==========================
+def parse_dates(titles, parse):
+    # 年の推定に直前の日付を使うため、ページ上の順番どおりに解析する
+    dates = []
+    previous = None
+    for title in titles:
+        parsed = parse(title, previous)
+        if parsed is not None:
+            previous = parsed
+        dates.append(parsed)
+    return dates
+
+def build_notes(source, sections, parse):
+    dates = parse_dates([title for title, _ in sections], parse)
+    return [
+        ReleaseNote(parsed, source, title, history_store.body_hash(body))
+        for parsed, (title, body) in zip(dates, sections)
+    ]
+
+def stop_before(watermark, parse, lookback=LOOKBACK_DAYS):
+    # 見出しを上から順に受け取り、既知の最新日付（watermark）の lookback 日前より古い見出しに達したら True を返す
+    previous = None
+    limit = watermark - timedelta(days=lookback) if watermark is not None else None
+
+    def stop(title):
+        nonlocal previous
+        parsed = parse(title, previous)
+        if parsed is None:
+            return False
+        previous = parsed
+        return limit is not None and parsed < limit
+
+    return stop
+
+def truncate_at(sections, stop):
+    # Selenium で取得済みのセクションにも同じ打ち切りを適用する
+    kept = []
+    for title, body in sections:
+        if stop(title):
+            break
+        kept.append((title, body))
+    return kept
@@ -0,0 +1,84 @@
+import argparse
+import sys
+import time
+from datetime import datetime
+
+import scrape_all
+import snapshots
+
+# ==========================
+# 再抽出（ブラウザもネットワークも使わず、保存済みの DOM に現在の抽出処理をかける）
+# ==========================
+def replay_entry(source, entry, html):
+    sections = source.fetch_sections_static(html)
+    if sections is None:
+        return "missing", []
+
+    empty = [title for title, body in sections if not body.strip()]
+    # 保存時は watermark で走査を打ち切っていることがあるので、保存時の件数ぶんだけを比べる
+    recorded = entry.get("sections_text_sha256")
+    if recorded and snapshots.sections_digest(sections[:entry["sections"]]) != recorded:
+        status = "changed"
+    elif empty:
+        status = "empty"
+    else:
+        status = "ok"
+    return status, sections
+
+def main():
+    parser = argparse.ArgumentParser(description="保存済みスナップショットからの再抽出")
+    parser.add_argument("--source", choices=[source.SOURCE for source in scrape_all.SOURCES], action="append", help="対象ソース（複数指定可）")
+    parser.add_argument("--days", type=float, default=7, help="直近何日分を対象にするか")
+    parser.add_argument("--kind", choices=["static", "rendered"], help="静的 HTML / 描画後の DOM のどちらかに絞る")
+    parser.add_argument("--limit", type=int, help="1ページから抽出する見出し数（既定は各スクレイパーの SCAN_LIMIT）")
+    parser.add_argument("--show", action="store_true", help="抽出したセクションを表示する")
+    parser.add_argument("--prune", action="store_true", help=f"{snapshots.MAX_AGE_DAYS} 日より古いスナップショットを削除して終了する")
+    args = parser.parse_args()
+
+    if args.prune:
+        print(f"🧹 {snapshots.prune()} 件のスナップショットを削除しました。")
+        return
+
+    # 再抽出した結果をまたスナップショットとして保存しない
+    snapshots.ENABLED = False
+    modules = {source.SOURCE: source for source in scrape_all.SOURCES}
+    if args.limit:
+        for source in modules.values():
+            source.SCAN_LIMIT = args.limit
+
+    start = time.perf_counter()
+    counts = {"ok": 0, "empty": 0, "changed": 0, "missing": 0}
+    results = {}
+    since = time.time() - args.days * 86400
+    for entry in snapshots.iter_index(args.source, since, args.kind):
+        # 同じ DOM は1回だけ抽出する（内容アドレスなので変更のない取得は同じキーになる）
+        key = (entry["source"], entry["sha256"])
+        if key not in results:
+            try:
+                html = snapshots.load(entry["sha256"])
+            except FileNotFoundError:
+                print(f"⚠️ 本文が見つかりません: {entry['sha256'][:12]}")
+                continue
+            results[key] = replay_entry(modules[entry["source"]], entry, html)
+        status, sections = results[key]
+        counts[status] += 1
+
+        mark = {"ok": "✅", "empty": "⚠️", "changed": "🔀", "missing": "❌"}[status]
+        taken = datetime.fromtimestamp(entry["ts"]).strftime("%Y-%m-%d %H:%M")
+        print(f"{mark} {taken} [{entry['source']}] {entry['kind']} {entry['sha256'][:12]}: {len(sections)} セクション")
+        if args.show:
+            for title, body in sections:
+                print(f"   【{title}】 {' '.join(body.split())[:120]}")
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(
+        f"📊 {total} 件（DOM {len(results)} 種類）を {elapsed:.2f} 秒で再抽出: "
+        f"一致 {counts['ok']} / 本文なし {counts['empty']} / 保存時と差分 {counts['changed']} / 見出しなし {counts['missing']}"
+    )
+    # まとめて検証するときに CI で失敗させられるよう、抽出できなかったものがあれば終了コード 1 を返す
+    if counts["missing"] or counts["empty"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
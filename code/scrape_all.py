@@ -0,0 +1,156 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import backfill
+import circuit
+import crawl
+import daemon
+import deadline
+import digest
+import history_store
+import metrics
+import page_state
+import scrape_claude
+import scrape_gemini
+import scrape_grok
+import scrape_openai
+from browser import init_webdriver, open_tabs
+
+# ==========================
+# 設定情報
+# ==========================
+# 各ソースの履歴・翻訳・Slack整形はそれぞれのモジュールの実装をそのまま使う
+SOURCES = [scrape_claude, scrape_gemini, scrape_grok, scrape_openai]
+
+# ==========================
+# セクション取得
+# ==========================
+def check_pages(state):
+    # 条件付き GET だけで変更の有無を判定する（変更がなければ描画も抽出もしない）
+    with ThreadPoolExecutor(max_workers=len(SOURCES)) as pool:
+        pages = pool.map(lambda source: page_state.check_page(source.URL, state, source.SOURCE), SOURCES)
+        return dict(zip(SOURCES, pages))
+
+def fetch_static(source, page, watermark):
+    try:
+        return source.fetch_sections_static(page["html"], watermark)
+    except circuit.CircuitOpen as e:
+        print(f"⏸️ [{source.SOURCE}] {e}。次回に持ち越します。")
+        page["skipped"] = True
+        return None
+    except Exception as e:
+        print(f"⚠️ [{source.SOURCE}] 静的取得エラー: {e}")
+        return None
+
+def fetch_all(pages, watermarks):
+    # 静的取得は並列に行う（各ソースとも記録済みの最新リリース日から一定日数より古い見出しで走査を打ち切る）
+    targets = [source for source in SOURCES if not pages[source]["unchanged"] and not pages[source]["skipped"]]
+    with ThreadPoolExecutor(max_workers=len(SOURCES)) as pool:
+        results = dict(zip(targets, pool.map(fetch_static, targets, [pages[s] for s in targets], [watermarks[s] for s in targets])))
+
+    sections = {source: result for source, result in results.items() if result is not None}
+    # ページの取得を止めているソースは、同じサイトをブラウザで開き直さない
+    pending = [source for source in targets if source not in sections and not pages[source]["skipped"]]
+    if not pending:
+        return sections
+
+    # ブラウザの起動・描画が続けて失敗しているとき、期限を過ぎたときは次回に回す
+    if not circuit.allow("browser") or deadline.expired():
+        print(f"⏸️ Selenium での取得を次回に持ち越します: {', '.join(s.SOURCE for s in pending)}")
+        return sections
+
+    # 静的 HTML で取れなかったソースだけ、1つのブラウザのタブで同時に読み込む
+    print(f"↪️ Selenium にフォールバックします: {', '.join(s.SOURCE for s in pending)}")
+    try:
+        driver = init_webdriver()
+    except Exception as e:
+        print(f"❌ ブラウザを起動できませんでした: {e}")
+        circuit.failure("browser")
+        return sections
+    try:
+        handles = open_tabs(driver, [source.URL for source in pending])
+        for source in pending:
+            pages[source]["rendered"] = True
+            driver.switch_to.window(handles[source.URL])
+            try:
+                sections[source] = source.fetch_sections_selenium(driver, watermarks[source])
+                circuit.success("browser")
+            except Exception as e:
+                print(f"❌ [{source.SOURCE}] エラーが発生しました: {e}")
+                circuit.failure("browser")
+    finally:
+        driver.quit()
+
+    return sections
+
+# ==========================
+# クロール処理
+# ==========================
+def main():
+    # cron の1回の実行を RUN_DEADLINE_SECONDS 以内に収める（残りは次回に持ち越す）
+    deadline.start()
+    histories = {source: source.load_history() for source in SOURCES}
+    watermarks = {source: history_store.scan_watermark(histories[source], source.SOURCE) for source in SOURCES}
+    state = page_state.load_state()
+    try:
+        pages = check_pages(state)
+        sections = fetch_all(pages, watermarks)
+
+        for source in SOURCES:
+            if pages[source]["unchanged"]:
+                print(f"📭 [{source.SOURCE}] ページに変更がないためスキップします。")
+                continue
+            if source not in sections:
+                continue
+            if deadline.expired():
+                print(f"⏱️ [{source.SOURCE}] 実行時間の上限に達したため次回に持ち越します。")
+                continue
+            print(f"🔍 [{source.SOURCE}] 差分確認: {source.URL}")
+            try:
+                if page_state.sections_unchanged(source.URL, state, sections[source]):
+                    print(f"📭 [{source.SOURCE}] 抽出結果に変更がないためスキップします。")
+                    complete = True
+                else:
+                    complete = crawl.process_sections(source, histories[source], sections[source])
+                # 持ち越した更新があれば、ページの状態を記録せず次回もう一度処理する
+                if complete:
+                    page_state.remember(source.URL, state, pages[source], sections[source])
+            except Exception as e:
+                print(f"❌ [{source.SOURCE}] エラーが発生しました: {e}")
+
+        flush_digest()
+    finally:
+        # 途中で止まっても、それまでの結果と依存先の失敗状況は残す
+        page_state.save_state(state)
+        circuit.save_state()
+        metrics.summary()
+
+def flush_digest(force=False):
+    if not digest.ENABLED and not force:
+        return
+    try:
+        digest.flush(force)
+    except Exception as e:
+        print(f"❌ ダイジェスト送信エラー: {e}")
+
+def cli():
+    parser = argparse.ArgumentParser(description="AI リリースノートクローラー")
+    parser.add_argument("--backfill", action="store_true", help="全見出しを翻訳してアーカイブに保存する（Slack には送らない）")
+    parser.add_argument("--source", choices=[source.SOURCE for source in SOURCES], action="append", help="--backfill / --daemon の対象ソース（複数指定可、既定は全ソース）")
+    parser.add_argument("--daemon", action="store_true", help="常駐してソースごとに間隔を調整しながらポーリングする")
+    parser.add_argument("--flush-digest", action="store_true", help="ウィンドウの経過を待たずにダイジェストを送信する")
+    parser.add_argument("--restart", action="store_true", help="チェックポイントを捨てて先頭からバックフィルする")
+    args = parser.parse_args()
+
+    sources = [source for source in SOURCES if not args.source or source.SOURCE in args.source]
+    if args.backfill:
+        backfill.run(sources, restart=args.restart)
+    elif args.daemon:
+        daemon.run(sources)
+    elif args.flush_digest:
+        flush_digest(force=True)
+    else:
+        main()
+
+if __name__ == "__main__":
+    cli()
@@ -1,178 +1,166 @@
 import os
+import sys
 import json
-import requests
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from openai import OpenAI
+
+import crawl
+import deadline
+import history_store
+import metrics
+import release_note
+import snapshots
+import static_fetch
+from browser import init_webdriver, iter_script_sections
 
 # ==========================
 # 設定情報
 # ==========================
+SOURCE = "claude"
 URL = "https://platform.claude.com/docs/ja/release-notes/overview"
+# 旧形式の履歴（SQLite への初回取り込みにのみ使用）
 HISTORY_FILE = "history/claude_release_notes.json"
 SLACK_WEBHOOK_URL = os.environ.get("SLACK_WEBHOOK_URL")
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# 各アップデートの見出し（日付）のクラス名
+TARGET_CLASS_SELECTOR = ".group.relative.pt-6.pb-2"
 
-# ==========================
-# WebDriver 初期化
-# ==========================
-def init_webdriver():
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    return webdriver.Chrome(options=options)
+# Slack メッセージの見出しと、末尾に付ける出典URL
+SLACK_HEADER = "📢 *Claude リリースノート更新*"
+SLACK_FOOTER = "🔗 出典: https://platform.claude.com/docs/ja/release-notes/overview"
+
+# 走査する見出しの数（履歴は SQLite に全件残るため、広げても重複投稿しない）
+SCAN_LIMIT = 6
+
+# 翻訳・要約の方針
+SYSTEM_PROMPT = "あなたは優秀なエンジニア兼翻訳者です。Anthropic Claudeのアップデート情報を、日本のユーザー向けに分かりやすく日本語で要約して翻訳してください。"
+
+# 既に日本語のセクションの扱い（"format" / "summarize" / "translate"。language.POLICIES を参照）
+# 日本語版のページなので LLM を通さずローカルで整形する
+JAPANESE_POLICY = "format"
+
+# ダイジェストモード（DIGEST_MODE=1）でも、まとめずにすぐ送るか
+URGENT = False
+
+# 本文を取り出せなかった見出しを送るときの表示（None なら空のまま送る）
+EMPTY_BODY_TEXT = "(コンテンツのテキスト抽出に失敗しました。構造を確認してください)"
 
 # ==========================
 # 履歴の読み書き
 # ==========================
 def load_history():
-    if os.path.exists(HISTORY_FILE):
-        try:
-            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return []
-    return []
-
-def save_history(history):
-    os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
-    with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+    # 旧形式（上位6件の JSON）の履歴は初回のみ SQLite に取り込む
+    conn = history_store.connect()
+    history_store.import_legacy(conn, SOURCE, HISTORY_FILE)
+    return conn
 
 # ==========================
-# ChatGPT API による翻訳
+# リリース日の解析
 # ==========================
-def translate_text(text):
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "あなたは優秀なエンジニア兼翻訳者です。Anthropic Claudeのアップデート情報を、日本のユーザー向けに分かりやすく日本語で要約して翻訳してください。"},
-                {"role": "user", "content": text}
-            ]
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        print(f"⚠️ 翻訳エラー: {e}")
-        return text
+# 見出しは "2026年8月19日" 形式
+def parse_release_date(title, previous=None):
+    return release_note.parse_ja_date(title, previous)
 
 # ==========================
-# Slack通知
+# セクション取得（静的 HTML → Selenium の順に試す）
 # ==========================
-def send_slack(message):
-    # メッセージ末尾にURLを付与
-    source_url = "https://platform.claude.com/docs/ja/release-notes/overview"
-    full_text = f"{message}\n\n🔗 出典: {source_url}"
-    
-    payload = {"text": full_text}
-    try:
-        response = requests.post(SLACK_WEBHOOK_URL, json=payload)
-        response.raise_for_status()
-    except Exception as e:
-        print(f"⚠️ Slack送信エラー: {e}")
-
-# ==========================
-# クロール処理
-# ==========================
-def main():
-    driver = init_webdriver()
-    history = load_history()
-    new_history = []
-    post_targets = []
-
-    # 指定されたクラス名
-    TARGET_CLASS_SELECTOR = ".group.relative.pt-6.pb-2"
+def fetch_sections_static(html=None, watermark=None):
+    # 記録済みの最新リリース日から release_note.LOOKBACK_DAYS 日より古い見出しに達したら、それ以降は走査しない
+    stop = release_note.stop_before(watermark, parse_release_date)
+    return static_fetch.fetch_sections(
+        URL, TARGET_CLASS_SELECTOR, start="sibling_or_parent", climb=True, nested=True,
+        last=SCAN_LIMIT, html=html, source=SOURCE, stop=stop
+    )
+
+# ページ内の見出しを走査し、各見出しから次の見出しまでの本文を JSON で返す
+EXTRACT_SCRIPT = """
+var selector = arguments[0];
+var first = arguments[1];
+var last = arguments[2];
+var headings = document.querySelectorAll(selector);
+var sections = [];
+
+for (var i = first; i < Math.min(last, headings.length); i++) {
+    var startNode = headings[i];
+    var title = startNode.innerText.trim();
+    if (!title) continue;
+
+    var result = "";
+
+    // 次の要素、または親の次の要素から開始（入れ子構造対策）
+    var curr = startNode.nextElementSibling;
+    if (!curr && startNode.parentElement) {
+        curr = startNode.parentElement.nextElementSibling;
+    }
+
+    while (curr) {
+        // 次のセクションの見出しクラスが見つかったら停止
+        if (curr.matches(selector) || curr.querySelector(selector)) break;
+
+        result += curr.innerText + "\\n";
+
+        // 次の兄弟要素へ
+        if (curr.nextElementSibling) {
+            curr = curr.nextElementSibling;
+        } else if (curr.parentElement) {
+            // 兄弟がいなければ親の兄弟へ（DOM構造の深さに対応）
+            curr = curr.parentElement.nextElementSibling;
+        } else {
+            curr = null;
+        }
+    }
+
+    sections.push({title: title, body: result});
+}
+return JSON.stringify(sections);
+"""
+
+def fetch_sections_selenium(driver=None, watermark=None):
+    # 共有ドライバーが渡された場合は、呼び出し側が現在のタブで URL の読み込みを開始済み
+    own_driver = driver is None
+    if own_driver:
+        driver = init_webdriver()
 
     try:
-        print(f"🔍 調査開始: {URL}")
-        driver.get(URL)
-        wait = WebDriverWait(driver, 20)
+        print(f"🌐 Selenium で取得します: {URL}")
+        if own_driver:
+            with metrics.timed("page_load", SOURCE):
+                driver.get(URL)
+        wait = WebDriverWait(driver, deadline.timeout("wait"))
         
         # ターゲット要素が読み込まれるまで待機
-        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, TARGET_CLASS_SELECTOR)))
-        
-        elements = driver.find_elements(By.CSS_SELECTOR, TARGET_CLASS_SELECTOR)
+        with metrics.timed("wait", SOURCE):
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, TARGET_CLASS_SELECTOR)))
         
-        # 1番目から6番目までを対象にする
-        end_idx = min(6, len(elements))
-        
-        for i in range(0, end_idx):
-            target_el = elements[i]
-            date_title = target_el.text.strip()
-            
-            if not date_title:
-                continue
-
-            new_history.append(date_title)
-
-            # 履歴になければ新規投稿
-            if date_title not in history:
-                print(f"✨ 新規アップデート発見: {date_title}")
-                
-                # JavaScriptで「次のアップデート見出し」が現れるまでコンテンツを収集
-                script = """
-                var startNode = arguments[0];
-                var selector = arguments[1];
-                var result = "";
-                
-                // 次の要素、または親の次の要素から開始（入れ子構造対策）
-                var curr = startNode.nextElementSibling;
-                if (!curr && startNode.parentElement) {
-                    curr = startNode.parentElement.nextElementSibling;
-                }
-
-                while (curr) {
-                    // 次のセクションの見出しクラスが見つかったら停止
-                    if (curr.matches(selector) || curr.querySelector(selector)) break;
-                    
-                    result += curr.innerText + "\\n";
-                    
-                    // 次の兄弟要素へ
-                    if (curr.nextElementSibling) {
-                        curr = curr.nextElementSibling;
-                    } else if (curr.parentElement) {
-                        // 兄弟がいなければ親の兄弟へ（DOM構造の深さに対応）
-                        curr = curr.parentElement.nextElementSibling;
-                    } else {
-                        curr = null;
-                    }
-                }
-                return result;
-                """
-                content_text = driver.execute_script(script, target_el, TARGET_CLASS_SELECTOR)
-                
-                if not content_text.strip():
-                    content_text = "(コンテンツのテキスト抽出に失敗しました。構造を確認してください)"
-
-                full_text = f"【{date_title}】\n{content_text}"
-                
-                # 翻訳・要約
-                translated_text = translate_text(full_text)
-                post_targets.append(translated_text)
-
-        # Slack送信処理
-        if post_targets:
-            # 古い順に送りたい場合は reversed(post_targets) にする
-            for post in post_targets:
-                send_slack(f"📢 *Claude リリースノート更新*\n\n{post}")
-            print(f"✅ {len(post_targets)} 件の更新を送信しました。")
-        else:
-            print("📭 新しい更新はありません。")
-
-        # 履歴の更新（今回チェックした上位6件を保存）
-        save_history(new_history)
-
-    except Exception as e:
-        print(f"❌ エラーが発生しました: {e}")
+        # 全セクションの (見出し, 本文) を1回の execute_script でまとめて取得する
+        with metrics.timed("execute_script", SOURCE) as m:
+            raw = driver.execute_script(EXTRACT_SCRIPT, TARGET_CLASS_SELECTOR, 0, SCAN_LIMIT)
+            m["extracted_bytes"] = len(raw.encode("utf-8"))
+
+        sections = [(item["title"], item["body"]) for item in json.loads(raw)]
+        # 描画後の DOM を残しておけば、セレクターを直したあとブラウザなしで再抽出できる
+        if snapshots.ENABLED:
+            snapshots.save(SOURCE, URL, driver.page_source, "rendered", sections)
     finally:
-        driver.quit()
+        if own_driver:
+            driver.quit()
+
+    return release_note.truncate_at(sections, release_note.stop_before(watermark, parse_release_date))
 
+# ==========================
+# 全件の逐次取得（バックフィル用）
+# ==========================
+# offset 件目以降の見出しを先頭から順に1件ずつ返す
+def iter_sections_static(html, offset=0):
+    return static_fetch.iter_sections(html, TARGET_CLASS_SELECTOR, first=offset, start="sibling_or_parent", climb=True, nested=True)
+
+def iter_sections_selenium(driver, offset=0):
+    # driver は呼び出し側で URL を読み込み済み
+    return iter_script_sections(driver, EXTRACT_SCRIPT, TARGET_CLASS_SELECTOR, first=offset)
+
+# ==========================
+# クロール処理（差分検出・翻訳・Slack送信は crawl.py で全ソース共通）
+# ==========================
 if __name__ == "__main__":
-    main()
+    crawl.main(sys.modules[__name__])
@@ -1,151 +1,150 @@
 import os
+import sys
 import json
-import requests
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from openai import OpenAI
+
+import crawl
+import deadline
+import history_store
+import metrics
+import release_note
+import snapshots
+import static_fetch
+from browser import init_webdriver, iter_script_sections
 
 # ==========================
 # 設定情報
 # ==========================
+SOURCE = "grok"
 URL = "https://docs.x.ai/docs/release-notes"
+# 旧形式の履歴（SQLite への初回取り込みにのみ使用）
 HISTORY_FILE = "history/grok_release_notes.json"
 SLACK_WEBHOOK_URL = os.environ.get("SLACK_WEBHOOK_URL")
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# 指定された日付クラスのセレクター
+TARGET_CLASS_SELECTOR = ".relative.-bottom-4"
 
-# ==========================
-# WebDriver 初期化
-# ==========================
-def init_webdriver():
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    return webdriver.Chrome(options=options)
+# Slack メッセージの見出しと、末尾に付ける出典URL
+SLACK_HEADER = "📢 *Grok リリースノート更新*"
+SLACK_FOOTER = "https://docs.x.ai/docs/release-notes"
 
-# ==========================
-# 履歴の読み書き
-# ==========================
-def load_history():
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+# 走査する見出しの数（履歴は SQLite に全件残るため、広げても重複投稿しない）
+SCAN_LIMIT = 6
+
+# 翻訳・要約の方針
+SYSTEM_PROMPT = "あなたは優秀なエンジニア兼翻訳者です。x.aiのGrokに関するアップデート情報を、日本のユーザー向けに分かりやすく日本語で要約して翻訳してください。"
+
+# 既に日本語のセクションの扱い（"format" / "summarize" / "translate"。language.POLICIES を参照）
+# 英語のページ。日本語のセクションが混ざった場合も通常どおり翻訳する
+JAPANESE_POLICY = "translate"
 
-def save_history(history):
-    os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
-    with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+# ダイジェストモード（DIGEST_MODE=1）でも、まとめずにすぐ送るか
+URGENT = False
+
+# 本文を取り出せなかった見出しを送るときの表示（None なら空のまま送る）
+EMPTY_BODY_TEXT = None
 
 # ==========================
-# ChatGPT API による翻訳
+# 履歴の読み書き
 # ==========================
-def translate_text(text):
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "あなたは優秀なエンジニア兼翻訳者です。x.aiのGrokに関するアップデート情報を、日本のユーザー向けに分かりやすく日本語で要約して翻訳してください。"},
-                {"role": "user", "content": text}
-            ]
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        print(f"⚠️ 翻訳エラー: {e}")
-        return text
+def load_history():
+    # 旧形式（上位6件の JSON）の履歴は初回のみ SQLite に取り込む
+    conn = history_store.connect()
+    history_store.import_legacy(conn, SOURCE, HISTORY_FILE)
+    return conn
 
 # ==========================
-# Slack通知
+# リリース日の解析
 # ==========================
-def send_slack(message):
-    # メッセージの末尾にGrokのリリースノートURLを追加
-    footer_url = "https://docs.x.ai/docs/release-notes"
-    payload = {"text": f"{message}\n\n{footer_url}"}
-    requests.post(SLACK_WEBHOOK_URL, json=payload)
+# 見出しは "May 1" 形式で年がないため、直前の見出しと今日の日付から年を推定する
+def parse_release_date(title, previous=None):
+    return release_note.parse_en_date(title, previous)
 
 # ==========================
-# クロール処理
+# セクション取得（静的 HTML → Selenium の順に試す）
 # ==========================
-def main():
-    driver = init_webdriver()
-    history = load_history()
-    new_history = []
-    post_targets = []
-
-    # 指定された日付クラスのセレクター
-    TARGET_CLASS_SELECTOR = ".relative.-bottom-4"
+def fetch_sections_static(html=None, watermark=None):
+    # 記録済みの最新リリース日から release_note.LOOKBACK_DAYS 日より古い見出しに達したら、それ以降は走査しない
+    stop = release_note.stop_before(watermark, parse_release_date)
+    return static_fetch.fetch_sections(
+        URL, TARGET_CLASS_SELECTOR, start="parent", nested=True, last=SCAN_LIMIT, html=html, source=SOURCE, stop=stop
+    )
+
+# ページ内の見出しを走査し、各見出しから次の見出しまでの本文を JSON で返す
+EXTRACT_SCRIPT = """
+var selector = arguments[0];
+var first = arguments[1];
+var last = arguments[2];
+var headings = document.querySelectorAll(selector);
+var sections = [];
+
+for (var i = first; i < Math.min(last, headings.length); i++) {
+    var startNode = headings[i];
+    var title = startNode.innerText.trim();
+    if (!title) continue;
+
+    // Grokの構造に合わせて、親要素を辿りながら次の日付要素までのテキストを収集
+    var result = "";
+    var curr = startNode.parentElement ? startNode.parentElement.nextElementSibling : startNode.nextElementSibling;
+
+    while (curr) {
+        if (curr.querySelector(selector) || curr.matches(selector)) break;
+        result += curr.innerText + "\\n";
+        curr = curr.nextElementSibling;
+    }
+
+    sections.push({title: title, body: result});
+}
+return JSON.stringify(sections);
+"""
+
+def fetch_sections_selenium(driver=None, watermark=None):
+    # 共有ドライバーが渡された場合は、呼び出し側が現在のタブで URL の読み込みを開始済み
+    own_driver = driver is None
+    if own_driver:
+        driver = init_webdriver()
 
     try:
-        print(f"🔍 Grok 調査開始: {URL}")
-        driver.get(URL)
-        wait = WebDriverWait(driver, 20)
+        print(f"🌐 Grok Selenium で取得します: {URL}")
+        if own_driver:
+            with metrics.timed("page_load", SOURCE):
+                driver.get(URL)
+        wait = WebDriverWait(driver, deadline.timeout("wait"))
         
         # 要素が読み込まれるのを待機
-        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, TARGET_CLASS_SELECTOR)))
-        
-        # 日付要素を取得
-        date_elements = driver.find_elements(By.CSS_SELECTOR, TARGET_CLASS_SELECTOR)
+        with metrics.timed("wait", SOURCE):
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, TARGET_CLASS_SELECTOR)))
         
-        # 上位6件を対象にする
-        end_idx = min(6, len(date_elements))
-        
-        for i in range(0, end_idx):
-            target_el = date_elements[i]
-            date_title = target_el.text.strip()
-            
-            if not date_title:
-                continue
-
-            new_history.append(date_title)
-
-            # 履歴になければ新規投稿対象
-            if date_title not in history:
-                print(f"✨ Grok 新規アップデート発見: {date_title}")
-                
-                # JavaScriptで次の日付要素が現れるまでのコンテンツを取得
-                # Grokの構造に合わせて、親要素を辿りながらテキストを収集
-                script = """
-                var startNode = arguments[0];
-                var selector = arguments[1];
-                var result = "";
-                var curr = startNode.parentElement ? startNode.parentElement.nextElementSibling : startNode.nextElementSibling;
-
-                while (curr) {
-                    if (curr.querySelector(selector) || curr.matches(selector)) break;
-                    result += curr.innerText + "\\n";
-                    curr = curr.nextElementSibling;
-                }
-                return result;
-                """
-                content_text = driver.execute_script(script, target_el, TARGET_CLASS_SELECTOR)
-                
-                full_text = f"【{date_title}】\n{content_text}"
-                
-                # 翻訳
-                translated_text = translate_text(full_text)
-                post_targets.append(translated_text)
-
-        # 新規があればSlack送信
-        if post_targets:
-            for post in post_targets:
-                send_slack(f"📢 *Grok リリースノート更新*\n\n{post}")
-            print(f"✅ {len(post_targets)} 件の更新をSlackに送信しました。")
-        else:
-            print("📭 新しいアップデートはありませんでした。")
-
-        # 履歴を更新
-        save_history(new_history)
-
-    except Exception as e:
-        print(f"❌ エラーが発生しました: {e}")
+        # 全セクションの (見出し, 本文) を1回の execute_script でまとめて取得する
+        with metrics.timed("execute_script", SOURCE) as m:
+            raw = driver.execute_script(EXTRACT_SCRIPT, TARGET_CLASS_SELECTOR, 0, SCAN_LIMIT)
+            m["extracted_bytes"] = len(raw.encode("utf-8"))
+
+        sections = [(item["title"], item["body"]) for item in json.loads(raw)]
+        # 描画後の DOM を残しておけば、セレクターを直したあとブラウザなしで再抽出できる
+        if snapshots.ENABLED:
+            snapshots.save(SOURCE, URL, driver.page_source, "rendered", sections)
     finally:
-        driver.quit()
+        if own_driver:
+            driver.quit()
+
+    return release_note.truncate_at(sections, release_note.stop_before(watermark, parse_release_date))
 
+# ==========================
+# 全件の逐次取得（バックフィル用）
+# ==========================
+# offset 件目以降の見出しを先頭から順に1件ずつ返す
+def iter_sections_static(html, offset=0):
+    return static_fetch.iter_sections(html, TARGET_CLASS_SELECTOR, first=offset, start="parent", nested=True)
+
+def iter_sections_selenium(driver, offset=0):
+    # driver は呼び出し側で URL を読み込み済み
+    return iter_script_sections(driver, EXTRACT_SCRIPT, TARGET_CLASS_SELECTOR, first=offset)
+
+# ==========================
+# クロール処理（差分検出・翻訳・Slack送信は crawl.py で全ソース共通）
+# ==========================
 if __name__ == "__main__":
-    main()
+    crawl.main(sys.modules[__name__])
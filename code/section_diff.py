@@ -0,0 +1,54 @@
+import difflib
+import hashlib
+
+import metrics
+
+# ==========================
+# 項目ごとの指紋
+# ==========================
+def split_items(body):
+    # 段落・箇条書きは1行ずつ抽出しているので、空白を正規化した各行を1項目とする
+    items = []
+    for line in (body or "").split("\n"):
+        text = " ".join(line.split())
+        if text:
+            items.append((fingerprint(text), text))
+    return items
+
+def fingerprint(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+# ==========================
+# 差分
+# ==========================
+def diff_items(old_items, new_items):
+    # 順序を保った最小の差分から、追加された項目と削除された項目を取り出す
+    matcher = difflib.SequenceMatcher(
+        a=[digest for digest, _ in old_items], b=[digest for digest, _ in new_items], autojunk=False
+    )
+    added, removed = [], []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "delete"):
+            removed.extend(text for _, text in old_items[i1:i2])
+        if tag in ("replace", "insert"):
+            added.extend(text for _, text in new_items[j1:j2])
+    return added, removed
+
+def delta_text(old_items, body, source=None):
+    # 前回の項目が記録されていなければ None（本文全体を送る）、
+    # 追加も削除もなければ ""（送らない）、それ以外は差分だけの本文を返す
+    if not old_items:
+        return None
+    added, removed = diff_items(old_items, split_items(body))
+    metrics.record("section_delta", source, added=len(added), removed=len(removed), items=len(old_items))
+    if not added and not removed:
+        return ""
+
+    lines = []
+    if added:
+        lines.append("追加された項目:")
+        lines.extend(f"• {text}" for text in added)
+    if removed:
+        lines.append("削除された項目:")
+        lines.extend(f"• {text}" for text in removed)
+    return "\n".join(lines)
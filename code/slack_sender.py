@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+import circuit
+import deadline
+import metrics
+
+# ==========================
+# 設定情報
+# ==========================
+LEDGER_FILE = "history/slack_ledger.json"
+LEDGER_MAX_AGE_DAYS = 180
+
+# Slack の上限（section ブロックの text は 3000 文字、1メッセージ 50 ブロックまで）
+MAX_SECTION_CHARS = 3000
+MAX_BLOCKS = 50
+MAX_MESSAGE_CHARS = 38000
+
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+
+# ストリーミング表示（SLACK_STREAMING=1）で使う Bot トークンの Web API（chat.postMessage / chat.update）
+SLACK_API_URL = os.environ.get("SLACK_API_URL", "https://slack.com/api")
+SLACK_BOT_TOKEN = os.environ.get("SLACK_BOT_TOKEN")
+SLACK_CHANNEL = os.environ.get("SLACK_CHANNEL")
+PLACEHOLDER = "⏳ 翻訳中…"
+
+# 期限切れで持ち越すとき、途中まで書いたメッセージを消すための1回だけの呼び出しの上限（秒）
+CLEANUP_TIMEOUT = 5.0
+
+# ==========================
+# 送信済み台帳（同じ更新を二重投稿しないため）
+# ==========================
+def load_ledger():
+    if os.path.exists(LEDGER_FILE):
+        try:
+            with open(LEDGER_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+    return {}
+
+def save_ledger(ledger):
+    now = int(time.time())
+    for key in [k for k, sent_at in ledger.items() if now - sent_at > LEDGER_MAX_AGE_DAYS * 86400]:
+        del ledger[key]
+    os.makedirs(os.path.dirname(LEDGER_FILE), exist_ok=True)
+    with open(LEDGER_FILE, 'w', encoding='utf-8') as f:
+        json.dump(ledger, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+def delivery_key(source, title, text):
+    payload = json.dumps([source, title, text], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# ==========================
+# Block Kit メッセージの組み立て
+# ==========================
+def section_blocks(text):
+    # 3000 文字を超える本文は改行位置で section ブロックを分ける
+    blocks = []
+    chunk = ""
+    for line in text.split("\n"):
+        while len(line) > MAX_SECTION_CHARS:
+            if chunk:
+                blocks.append(chunk)
+                chunk = ""
+            blocks.append(line[:MAX_SECTION_CHARS])
+            line = line[MAX_SECTION_CHARS:]
+        candidate = f"{chunk}\n{line}" if chunk else line
+        if len(candidate) > MAX_SECTION_CHARS:
+            blocks.append(chunk)
+            chunk = line
+        else:
+            chunk = candidate
+    if chunk.strip():
+        blocks.append(chunk)
+    return [{"type": "section", "text": {"type": "mrkdwn", "text": block}} for block in blocks if block.strip()]
+
+def build_messages(header, items, footer):
+    # items: [(配信キー, 本文), ...] → [(配信キーのリスト, payload), ...]
+    # 1ソース分の更新をできるだけ1メッセージにまとめ、上限を超える場合だけ分割する
+    messages = []
+    keys, blocks, texts, size = [], [], [], 0
+
+    def flush():
+        if not keys:
+            return
+        body = [{"type": "section", "text": {"type": "mrkdwn", "text": header}}] + blocks
+        body.append({"type": "context", "elements": [{"type": "mrkdwn", "text": footer}]})
+        fallback = "\n\n".join([header] + texts + [footer])
+        messages.append((list(keys), {"text": fallback[:MAX_MESSAGE_CHARS], "blocks": body}))
+
+    for key, text in items:
+        item_blocks = section_blocks(text)
+        if keys:
+            item_blocks = [{"type": "divider"}] + item_blocks
+        if keys and (len(blocks) + len(item_blocks) + 2 > MAX_BLOCKS or size + len(text) > MAX_MESSAGE_CHARS):
+            flush()
+            keys, blocks, texts, size = [], [], [], 0
+            item_blocks = item_blocks[1:]
+        keys.append(key)
+        blocks.extend(item_blocks[:MAX_BLOCKS - 2])
+        texts.append(text)
+        size += len(text)
+    flush()
+    return messages
+
+# ==========================
+# 送信（429 / Retry-After に従って再送する）
+# ==========================
+async def post_with_retry(http, webhook_url, payload, source=None):
+    return await request_with_retry(http, webhook_url, payload, source) is not None
+
+async def request_with_retry(http, url, payload, source=None, headers=None, stage="slack_post", timeout=None, best_effort=False):
+    # 成功すれば応答、送れなければ None。timeout を省略すると残り時間に合わせる
+    # best_effort は1回だけ送り、失敗してもサーキットブレーカーには数えない（ストリーミングの途中経過用）
+    # 失敗が続いている間は送らない（台帳に載らないので次回の実行で送り直される）
+    if not circuit.allow("slack"):
+        print("⏸️ Slack への送信を止めているため、次回に持ち越します。")
+        return None
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            with metrics.timed(stage, source, attempt=attempt) as m:
+                response = await http.post(url, json=payload, headers=headers, timeout=timeout or deadline.timeout("slack"))
+                m["status"] = response.status_code
+        except deadline.DeadlineExceeded as e:
+            print(f"⚠️ Slack送信エラー: {e}")
+            return None
+        except Exception as e:
+            print(f"⚠️ Slack送信エラー: {e}")
+            response = None
+
+        if response is not None and response.status_code < 400:
+            circuit.success("slack")
+            return response
+        if response is not None and response.status_code != 429 and response.status_code < 500:
+            print(f"⚠️ Slack送信エラー: {response.status_code} {response.text}")
+            return None
+        if best_effort:
+            return None
+        if attempt == MAX_RETRIES:
+            print("⚠️ Slack送信エラー: 再送回数の上限に達しました")
+            break
+
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = BACKOFF_BASE * (2 ** attempt) + random.uniform(0, BACKOFF_BASE)
+        if delay >= deadline.remaining():
+            print("⚠️ Slack送信エラー: 実行時間の上限までに再送できません")
+            break
+        print(f"⏳ Slack の応答待ち（{delay:.1f} 秒後に再送）")
+        await asyncio.sleep(delay)
+    circuit.failure("slack")
+    return None
+
+async def send_updates(http, webhook_url, header, items, footer, ledger, source=None):
+    # 送信に成功したメッセージの分だけ台帳に記録し、送信できた件数を返す
+    sent = 0
+    for keys, payload in build_messages(header, items, footer):
+        if not await post_with_retry(http, webhook_url, payload, source):
+            break
+        now = int(time.time())
+        for key in keys:
+            ledger[key] = now
+        sent += len(keys)
+    return sent
+
+# ==========================
+# Bot トークンでの投稿・更新（ストリーミング表示用）
+# ==========================
+async def api_call(http, method, payload, source=None, timeout=None, best_effort=False):
+    # Web API は失敗も 200 で返すので ok を見る。成功すれば応答の JSON、失敗すれば None
+    headers = {"Authorization": f"Bearer {SLACK_BOT_TOKEN}"}
+    response = await request_with_retry(
+        http, f"{SLACK_API_URL}/{method}", {"channel": SLACK_CHANNEL, **payload}, source, headers, f"slack_{method}",
+        timeout, best_effort,
+    )
+    if response is None:
+        return None
+    body = response.json()
+    if not body.get("ok"):
+        print(f"⚠️ Slack API エラー（{method}）: {body.get('error')}")
+        return None
+    return body
+
+def message_payloads(header, text, footer):
+    return [payload for _, payload in build_messages(header, [(None, text)], footer)]
+
+async def post_placeholder(http, header, title, footer, source=None):
+    # 翻訳が届く前に見出しだけのメッセージを投稿し、更新に使う ts を返す
+    body = await api_call(http, "chat.postMessage", message_payloads(header, f"【{title}】\n{PLACEHOLDER}", footer)[0], source)
+    return body["ts"] if body else None
+
+async def update_message(http, ts, header, text, footer, source=None, final=False, best_effort=False):
+    # 上限を超える本文は、最後の更新のときだけ残りをスレッドに続けて投稿する
+    payloads = message_payloads(header, text, footer)
+    if not await api_call(http, "chat.update", {"ts": ts, **payloads[0]}, source, best_effort=best_effort):
+        return False
+    if final:
+        for payload in payloads[1:]:
+            if not await api_call(http, "chat.postMessage", {"thread_ts": ts, **payload}, source):
+                return False
+    return True
+
+async def delete_message(http, ts, source=None):
+    # 期限を過ぎていても、途中までのメッセージを残さないよう一度は呼ぶ
+    return await api_call(http, "chat.delete", {"ts": ts}, source, CLEANUP_TIMEOUT) is not None
@@ -0,0 +1,114 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import metrics
+
+# ==========================
+# 設定情報
+# ==========================
+# SNAPSHOTS=1 のときだけ、抽出に使った DOM を保存する
+ENABLED = os.environ.get("SNAPSHOTS") == "1"
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")
+INDEX_FILE = "index.jsonl"
+MAX_AGE_DAYS = 30
+
+_lock = threading.Lock()
+
+# ==========================
+# 保存（本文は SHA-256 をキーに gzip で1回だけ書き、取得のたびに索引へ1行追記する）
+# ==========================
+def object_path(digest):
+    return os.path.join(SNAPSHOT_DIR, "objects", digest[:2], f"{digest[2:]}.html.gz")
+
+def sections_digest(sections):
+    # 保存時の抽出結果。再抽出の結果と比べて、抽出処理の変更による差分を見つけるために使う
+    # 描画後の DOM は保存時に innerText、再抽出では静的 HTML の走査で取り出すので、空白の違いは無視する
+    if sections is None:
+        return None
+    sections = [[" ".join(title.split()), " ".join(body.split())] for title, body in sections]
+    payload = json.dumps(sections, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def save(source, url, html, kind, sections=None):
+    # kind: "static" = 静的 HTML / "rendered" = Selenium で描画後の DOM
+    if not ENABLED or not html:
+        return None
+
+    data = html.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    path = object_path(digest)
+    entry = {
+        "ts": round(time.time(), 3), "run_id": metrics.RUN_ID, "source": source, "url": url, "kind": kind,
+        "sha256": digest, "bytes": len(data), "sections": len(sections or []), "sections_text_sha256": sections_digest(sections),
+    }
+    try:
+        with _lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_file = f"{path}.tmp"
+                with gzip.open(tmp_file, 'wb', compresslevel=6) as f:
+                    f.write(data)
+                os.replace(tmp_file, path)
+            with open(os.path.join(SNAPSHOT_DIR, INDEX_FILE), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except Exception as e:
+        print(f"⚠️ スナップショット保存エラー: {e}")
+        return None
+    metrics.record("snapshot", source, stored_bytes=len(data), kind=kind)
+    return digest
+
+# ==========================
+# 読み出し
+# ==========================
+def load(digest):
+    with gzip.open(object_path(digest), 'rb') as f:
+        return f.read().decode("utf-8")
+
+def iter_index(source=None, since=None, kind=None):
+    index_file = os.path.join(SNAPSHOT_DIR, INDEX_FILE)
+    if not os.path.exists(index_file):
+        return
+    with open(index_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if source and entry["source"] not in source:
+                continue
+            if since and entry["ts"] < since:
+                continue
+            if kind and entry["kind"] != kind:
+                continue
+            yield entry
+
+# ==========================
+# 古いスナップショットの削除
+# ==========================
+def prune(max_age_days=MAX_AGE_DAYS):
+    # 索引から古い行を落とし、どの行からも参照されなくなった本文を消す
+    index_file = os.path.join(SNAPSHOT_DIR, INDEX_FILE)
+    if not os.path.exists(index_file):
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    with _lock:
+        entries = list(iter_index())
+        kept = [entry for entry in entries if entry["ts"] >= cutoff]
+        tmp_file = f"{index_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for entry in kept:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_file, index_file)
+
+        referenced = {entry["sha256"] for entry in kept}
+        removed = 0
+        for entry in entries:
+            path = object_path(entry["sha256"])
+            if entry["sha256"] not in referenced and os.path.exists(path):
+                os.remove(path)
+                removed += 1
+    return removed
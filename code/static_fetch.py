@@ -0,0 +1,185 @@
+import random
+import time
+from urllib.parse import urlsplit
+
+import httpx
+from selectolax.parser import HTMLParser
+
+import circuit
+import deadline
+import metrics
+import snapshots
+
+# ==========================
+# 設定情報
+# ==========================
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+FETCH_TIMEOUT = 15.0
+
+# 接続エラー・5xx のときの再試行回数と待ち時間の基準（秒、ジッターつき指数バックオフ）
+FETCH_RETRIES = 2
+FETCH_BACKOFF = 1.0
+
+# innerText と同様に改行を挟むブロック要素
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "dd", "details", "div", "dl", "dt",
+    "figcaption", "figure", "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header",
+    "hr", "li", "main", "nav", "ol", "p", "pre", "section", "summary", "table", "tr", "ul",
+}
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg"}
+
+# 接続を使い回すため、プロセス内で1つのクライアントを共有する（httpx.Client はスレッドセーフ）
+_client = None
+
+# ==========================
+# HTML 取得
+# ==========================
+def http_client():
+    global _client
+    if _client is None:
+        _client = httpx.Client(timeout=FETCH_TIMEOUT, follow_redirects=True)
+    return _client
+
+def fetch_response(url, extra_headers=None):
+    headers = {"User-Agent": USER_AGENT, "Accept-Language": "ja,en;q=0.8"}
+    if extra_headers:
+        headers.update(extra_headers)
+    # 失敗が続いているサイトには取りに行かない
+    name = f"page:{urlsplit(url).netloc}"
+    circuit.check(name)
+    for attempt in range(FETCH_RETRIES + 1):
+        try:
+            response = http_client().get(url, headers=headers, timeout=deadline.timeout("page_fetch"))
+            if response.status_code < 500:
+                break
+            error = httpx.HTTPStatusError(f"{response.status_code}", request=response.request, response=response)
+        except httpx.TransportError as e:
+            error = e
+        delay = FETCH_BACKOFF * (2 ** attempt) + random.uniform(0, FETCH_BACKOFF)
+        if attempt == FETCH_RETRIES or delay >= deadline.remaining():
+            circuit.failure(name)
+            raise error
+        time.sleep(delay)
+
+    circuit.success(name)
+    # 304 Not Modified は条件付き取得の正常な応答として呼び出し側に返す
+    if response.status_code != 304:
+        response.raise_for_status()
+    return response
+
+def fetch_html(url):
+    return fetch_response(url).text
+
+# ==========================
+# DOM ユーティリティ（Selenium 版の JavaScript と同じ辿り方をする）
+# ==========================
+def next_element(node):
+    # nextElementSibling 相当（テキストノードを飛ばす）
+    curr = node.next
+    while curr is not None and (curr.tag.startswith("-") or curr.tag == "_comment"):
+        curr = curr.next
+    return curr
+
+def inner_text(node):
+    parts = []
+
+    def walk(n):
+        if n.tag == "-text":
+            parts.append(n.text(deep=False))
+            return
+        if n.tag in SKIP_TAGS or n.tag.startswith("_") or n.tag.startswith("-"):
+            return
+        if n.tag == "br":
+            parts.append("\n")
+            return
+        block = n.tag in BLOCK_TAGS
+        if block:
+            parts.append("\n")
+        child = n.child
+        while child is not None:
+            walk(child)
+            child = child.next
+        if block:
+            parts.append("\n")
+
+    walk(node)
+    lines = [" ".join(line.split()) for line in "".join(parts).split("\n")]
+    return "\n".join(line for line in lines if line)
+
+def is_heading(node, selector, nested):
+    if node.css_matches(selector):
+        return True
+    return nested and node.css_first(selector) is not None
+
+def collect_section(start_node, selector, start="sibling", climb=False, nested=False):
+    # start: "sibling" = 次の兄弟から / "sibling_or_parent" = 兄弟がなければ親の兄弟から / "parent" = 親の兄弟から
+    # climb: 兄弟が尽きたら親の兄弟へ進む
+    # nested: 子孫に見出しを含む要素でも停止する
+    if start == "parent" and start_node.parent is not None:
+        curr = next_element(start_node.parent)
+    else:
+        curr = next_element(start_node)
+        if curr is None and start == "sibling_or_parent" and start_node.parent is not None:
+            curr = next_element(start_node.parent)
+
+    result = ""
+    while curr is not None:
+        if is_heading(curr, selector, nested):
+            break
+        result += inner_text(curr) + "\n"
+
+        following = next_element(curr)
+        if following is None and climb and curr.parent is not None:
+            following = next_element(curr.parent)
+        curr = following
+    return result
+
+# ==========================
+# 静的 HTML からのセクション抽出
+# ==========================
+def extract_sections(html, selector, first=0, last=6, stop=None, **walk_options):
+    # 見出しが静的 DOM に存在しなければ None を返し、呼び出し側で Selenium にフォールバックさせる
+    # stop(見出し) が True を返したら、その見出しの本文は集めずに走査を終える
+    tree = HTMLParser(html)
+    headings = tree.css(selector)
+    if len(headings) <= first:
+        return None
+
+    sections = []
+    for target in headings[first:min(last, len(headings))]:
+        date_title = inner_text(target).strip()
+        if not date_title:
+            continue
+        if stop is not None and stop(date_title):
+            return sections
+        sections.append((date_title, collect_section(target, selector, **walk_options)))
+    return sections or None
+
+def iter_sections(html, selector, first=0, **walk_options):
+    # 全見出しを先頭から1件ずつ返す（本文は取り出されたときに初めて集める）
+    tree = HTMLParser(html)
+    for target in tree.css(selector)[first:]:
+        date_title = inner_text(target).strip()
+        if date_title:
+            yield date_title, collect_section(target, selector, **walk_options)
+
+def fetch_sections(url, selector, first=0, last=6, html=None, source=None, stop=None, **walk_options):
+    # 条件付き取得で既に本文を持っている場合は再取得しない
+    if html is None:
+        try:
+            with metrics.timed("static_fetch", source) as m:
+                html = fetch_html(url)
+                m["fetched_bytes"] = len(html.encode("utf-8"))
+        except circuit.CircuitOpen:
+            # 同じサイトを Selenium で開き直しても失敗するだけなので、呼び出し側でこのソースを飛ばさせる
+            raise
+        except Exception as e:
+            print(f"⚠️ 静的取得エラー: {e}")
+            return None
+
+    with metrics.timed("static_extract", source) as m:
+        sections = extract_sections(html, selector, first=first, last=last, stop=stop, **walk_options)
+        m["sections"] = len(sections or [])
+        m["extracted_bytes"] = sum(len(body.encode("utf-8")) for _, body in sections or [])
+    snapshots.save(source, url, html, "static", sections)
+    return sections
@@ -0,0 +1,269 @@
+import json
+import re
+import time
+
+import circuit
+import metrics
+import translation_cache
+
+# ==========================
+# 設定情報
+# ==========================
+MODEL = "gpt-4o"
+
+# 既に日本語のページを要約だけするときの小さいモデル
+SUMMARY_MODEL = "gpt-4o-mini"
+
+# 1リクエストに詰める入力トークン数の上限（超える場合のみ複数バッチに分割する）
+BATCH_TOKEN_BUDGET = 6000
+
+# 1セクションを1リクエストで送れる上限。超える本文は行（段落・箇条書き）単位で分割して並行に翻訳する
+SECTION_TOKEN_BUDGET = 2000
+
+# 見出しの取りこぼしでページ全体を吸い込んだようなセクションは、ここで打ち切る
+MAX_SECTION_TOKENS = 16000
+TRUNCATION_NOTICE = "…（長すぎるため以降を省略しました。全文は出典を参照してください）"
+
+CONTINUATION_INSTRUCTION = "入力は長いセクションを分割した続きの部分です。見出しや前置きを付けず、この部分の本文だけを要約・翻訳してください。"
+
+BATCH_INSTRUCTION = (
+    "入力は「見出し → 本文」の JSON オブジェクトです。"
+    "各本文を上記の方針で日本語に要約・翻訳し、同じ見出しをキー、翻訳結果を値とする JSON オブジェクトだけを返してください。"
+)
+
+# ==========================
+# トークン見積もり
+# ==========================
+def estimate_tokens(text):
+    # tiktoken に依存しない粗い見積もり（日本語は1文字≒1トークン、英語は4文字≒1トークン）
+    return len(text.encode("utf-8")) // 3 + 1
+
+def split_batches(items, budget=BATCH_TOKEN_BUDGET):
+    batches = []
+    current = []
+    used = 0
+    for title, text in items:
+        cost = estimate_tokens(title) + estimate_tokens(text)
+        if current and used + cost > budget:
+            batches.append(current)
+            current = []
+            used = 0
+        current.append((title, text))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+# ==========================
+# 長いセクションの分割
+# ==========================
+def split_line(line, budget):
+    # 1行で上限を超える場合だけ、文字数で按分して切る
+    pieces = []
+    while estimate_tokens(line) > budget:
+        cut = max(1, len(line) * budget // estimate_tokens(line))
+        pieces.append(line[:cut])
+        line = line[cut:]
+    pieces.append(line)
+    return pieces
+
+def cap_text(text, limit=MAX_SECTION_TOKENS):
+    # 上限を超える本文は行の切れ目で打ち切り、打ち切ったかどうかを返す
+    if estimate_tokens(text) <= limit:
+        return text, False
+    kept = []
+    used = 0
+    for line in text.split("\n"):
+        for piece in split_line(line, limit):
+            cost = estimate_tokens(piece)
+            if used + cost > limit:
+                return "\n".join(kept), True
+            kept.append(piece)
+            used += cost
+    return "\n".join(kept), True
+
+def chunk_text(text, budget=SECTION_TOKEN_BUDGET):
+    # 段落・箇条書きは1行ずつ抽出しているので、行の切れ目で予算内にまとめる
+    chunks = []
+    current = []
+    used = 0
+    for line in re.split(r"\n+", text):
+        if not line.strip():
+            continue
+        for piece in split_line(line, budget):
+            cost = estimate_tokens(piece)
+            if current and used + cost > budget:
+                chunks.append("\n".join(current))
+                current = []
+                used = 0
+            current.append(piece)
+            used += cost
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+def plan_chunks(items, budget=SECTION_TOKEN_BUDGET, limit=MAX_SECTION_TOKENS):
+    # 予算内のセクションはそのまま、超えるものは {見出し: (分割後の本文リスト, 打ち切ったか)} に分ける
+    regular = []
+    chunked = {}
+    for title, text in items:
+        if estimate_tokens(title) + estimate_tokens(text) <= budget:
+            regular.append((title, text))
+            continue
+        text, truncated = cap_text(text, limit)
+        chunked[title] = (chunk_text(text, budget), truncated)
+    return regular, chunked
+
+def join_chunks(parts, truncated):
+    text = "\n".join(part.strip() for part in parts)
+    if truncated:
+        text = f"{text}\n{TRUNCATION_NOTICE}"
+    return text
+
+# ==========================
+# 翻訳（同期・単発）
+# ==========================
+def request_one(client, system_prompt, text, source=None, model=MODEL):
+    with metrics.timed("translate", source, model=model, sections=1) as m:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": text}
+            ]
+        )
+        m.update(metrics.usage_fields(response))
+    return response.choices[0].message.content
+
+# ==========================
+# 翻訳（非同期・一括）
+# ==========================
+def plan_batches(system_prompt, items, source=None, budget=BATCH_TOKEN_BUDGET, model=MODEL):
+    # キャッシュ済みの結果と、API に送る必要があるバッチに分ける
+    cached = {}
+    pending = []
+    for title, text in items:
+        value = translation_cache.get(translation_cache.cache_key(source, model, system_prompt, text))
+        if value is not None:
+            cached[title] = value
+        else:
+            pending.append((title, text))
+    return cached, split_batches(pending, budget)
+
+async def translate_one_async(aclient, system_prompt, text, source=None, model=MODEL):
+    # 失敗したとき・OpenAI の失敗が続いている間は None を返す（呼び出し側で次回に持ち越す）
+    if not circuit.allow("openai"):
+        return None
+    try:
+        with metrics.timed("translate", source, model=model, sections=1) as m:
+            response = await aclient.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": text}
+                ]
+            )
+            m.update(metrics.usage_fields(response))
+        translated = response.choices[0].message.content
+    except Exception as e:
+        # 原文を翻訳結果として扱わない（パイプラインは次回に持ち越し、バックフィルは中断する）
+        print(f"⚠️ 翻訳エラー: {e}")
+        circuit.failure("openai")
+        return None
+
+    circuit.success("openai")
+    translation_cache.put(translation_cache.cache_key(source, model, system_prompt, text), translated)
+    return translated
+
+def chunk_prompt(system_prompt, index):
+    # 2つ目以降の分割は続きであることを伝え、見出しの付け直しや前置きの重複を防ぐ
+    return system_prompt if index == 0 else f"{system_prompt}\n{CONTINUATION_INSTRUCTION}"
+
+async def translate_chunk_async(aclient, system_prompt, chunk, index, source=None, model=MODEL):
+    prompt = chunk_prompt(system_prompt, index)
+    cached = translation_cache.get(translation_cache.cache_key(source, model, prompt, chunk))
+    if cached is not None:
+        return cached
+    return await translate_one_async(aclient, prompt, chunk, source, model)
+
+async def translate_stream_async(aclient, system_prompt, text, on_delta, source=None, model=MODEL):
+    # 応答をトークン単位で受け取り、届いた断片ごとに on_delta(断片) を呼ぶ。戻り値は全文
+    key = translation_cache.cache_key(source, model, system_prompt, text)
+    cached = translation_cache.get(key)
+    if cached is not None:
+        on_delta(cached)
+        return cached
+    if not circuit.allow("openai"):
+        return None
+
+    parts = []
+    try:
+        with metrics.timed("translate", source, model=model, sections=1, stream=True) as m:
+            start = time.perf_counter()
+            stream = await aclient.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": text}
+                ],
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            async for chunk in stream:
+                if chunk.usage:
+                    m.update(metrics.usage_fields(chunk))
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if not parts:
+                    m["first_token_seconds"] = round(time.perf_counter() - start, 4)
+                parts.append(chunk.choices[0].delta.content)
+                on_delta(parts[-1])
+    except Exception as e:
+        # 原文を翻訳結果として扱わない（パイプラインは次回に持ち越し、バックフィルは中断する）
+        print(f"⚠️ 翻訳エラー: {e}")
+        circuit.failure("openai")
+        return None
+
+    circuit.success("openai")
+    translated = "".join(parts)
+    translation_cache.put(key, translated)
+    return translated
+
+async def translate_batch_async(aclient, system_prompt, batch, source=None, model=MODEL):
+    # batch: [(見出し, 本文), ...] → {見出し: 翻訳結果}
+    if len(batch) == 1:
+        title, text = batch[0]
+        return {title: await translate_one_async(aclient, system_prompt, text, source, model)}
+    if not circuit.allow("openai"):
+        return {title: None for title, _ in batch}
+
+    try:
+        with metrics.timed("translate", source, model=model, sections=len(batch)) as m:
+            response = await aclient.chat.completions.create(
+                model=model,
+                response_format={"type": "json_object"},
+                messages=[
+                    {"role": "system", "content": f"{system_prompt}\n{BATCH_INSTRUCTION}"},
+                    {"role": "user", "content": json.dumps(dict(batch), ensure_ascii=False)}
+                ]
+            )
+            m.update(metrics.usage_fields(response))
+        circuit.success("openai")
+        translated = json.loads(response.choices[0].message.content)
+        if not isinstance(translated, dict):
+            translated = {}
+    except Exception as e:
+        print(f"⚠️ 一括翻訳エラー: {e}")
+        circuit.failure("openai")
+        translated = {}
+
+    # 応答に含まれなかった見出しだけ個別に翻訳し直す
+    results = {}
+    for title, text in batch:
+        value = translated.get(title)
+        if isinstance(value, str) and value.strip():
+            results[title] = value
+            translation_cache.put(translation_cache.cache_key(source, model, system_prompt, text), value)
+        else:
+            results[title] = await translate_one_async(aclient, system_prompt, text, source, model)
+    return results
@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+import time
+
+# ==========================
+# 設定情報
+# ==========================
+CACHE_FILE = "history/translation_cache.json"
+
+# 件数・経過日数の上限（超えたものは最終利用が古い順に削除する）
+MAX_ENTRIES = 500
+MAX_AGE_DAYS = 90
+
+_cache = None
+
+# ==========================
+# キャッシュの読み書き
+# ==========================
+def load_cache():
+    global _cache
+    if _cache is None:
+        _cache = {}
+        if os.path.exists(CACHE_FILE):
+            try:
+                with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+                    _cache = json.load(f)
+            except Exception:
+                _cache = {}
+    return _cache
+
+def save_cache():
+    if _cache is None:
+        return
+    evict(_cache)
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    # 書き込み途中で落ちても壊れたファイルが残らないよう、一時ファイルから置き換える
+    tmp_file = f"{CACHE_FILE}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(_cache, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_file, CACHE_FILE)
+
+def evict(cache, now=None):
+    now = now or int(time.time())
+    expired = [key for key, entry in cache.items() if now - entry.get("used", 0) > MAX_AGE_DAYS * 86400]
+    for key in expired:
+        del cache[key]
+
+    overflow = len(cache) - MAX_ENTRIES
+    if overflow > 0:
+        for key in sorted(cache, key=lambda k: cache[k].get("used", 0))[:overflow]:
+            del cache[key]
+
+# ==========================
+# 参照・登録
+# ==========================
+def cache_key(source, model, prompt, text):
+    payload = json.dumps([source, model, prompt, text], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get(key):
+    entry = load_cache().get(key)
+    if entry is None:
+        return None
+    entry["used"] = int(time.time())
+    return entry["value"]
+
+def put(key, value):
+    now = int(time.time())
+    load_cache()[key] = {"value": value, "created": now, "used": now}